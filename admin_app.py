@@ -1,15 +1,48 @@
+import html
+import io
+import os
+from datetime import date, timedelta
 import streamlit as st
-from data_utils import load_reviews
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+from data_utils import (
+    CATEGORIES, PAGE_SIZE, TREND_BUCKETS, load_change_token, load_data_version, load_review_page, load_review_stats,
+    load_review_clusters, load_review_trends, search_reviews, start_warm_up, warm_up_store
+)
+from export_reviews import EXPORT_FORMATS, export_reviews, parquet_available
+from metrics_utils import (
+    collect_snapshots, histogram_quantile, merge_snapshots, render_prometheus, start_metrics_exporter
+)
 
 st.set_page_config(page_title="Admin Dashboard", page_icon="📊", layout="wide")
+start_metrics_exporter()
+start_warm_up(warm_up_store)
+
+# pandas/plotly are imported inside the cached builders below, so the header
+# and metric cards render before the charting stack has loaded
+
+# Derived artifacts are cached against the (max id, count) data version, so a
+# cache lookup hashes a 2-tuple instead of the table. The TTL catches in-place
+# updates (e.g. backfills) that leave the version unchanged.
+DERIVED_TTL = 300
+
+# Live mode: how often the sections re-check for changes, and whether the
+# page opens with it on (e.g. for a wall screen)
+LIVE_INTERVAL = float(os.environ.get("ADMIN_LIVE_INTERVAL", "5"))
+ADMIN_LIVE = os.environ.get("ADMIN_LIVE", "0") == "1"
+# Larger exports go through export_reviews.py, which streams to disk
+ADMIN_EXPORT_MAX_ROWS = int(os.environ.get("ADMIN_EXPORT_MAX_ROWS", "50000"))
+
+@st.cache_data(ttl=DERIVED_TTL)
+def cached_stats(version: tuple) -> dict:
+    return load_review_stats()
 
 # Cache chart generation for speed
-@st.cache_data
-def generate_charts(data: pd.DataFrame):
-    rating_counts = data["rating"].value_counts().sort_index()
+@st.cache_data(ttl=DERIVED_TTL)
+def generate_charts(version: tuple):
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    rating_counts = pd.Series(cached_stats(version)["rating_counts"]).sort_index()
 
     fig_pie = px.pie(
         values=rating_counts.values,
@@ -51,6 +84,147 @@ def generate_charts(data: pd.DataFrame):
     )
     return fig_pie, fig_bar
 
+@st.cache_data(ttl=DERIVED_TTL, max_entries=64)
+def trend_charts(version: tuple, bucket: str, days: int, category):
+    # Aggregated in SQL: one row per (bucket, category), never the raw reviews
+    import pandas as pd
+    import plotly.express as px
+
+    trends = load_review_trends(bucket, days=days, category=category)
+    if trends.empty:
+        return None, None
+    trends["bucket"] = pd.to_datetime(trends["bucket"])
+
+    palette = ['#1a1a1a', '#6a6a6a', '#aaaaaa', '#d0c8b8']
+    layout = dict(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#1a1a1a', size=12),
+        height=350,
+        xaxis=dict(gridcolor='#e0e0e0', title=""),
+        yaxis=dict(gridcolor='#e0e0e0'),
+        legend=dict(title=""),
+        margin=dict(t=10, b=40, l=40, r=10)
+    )
+
+    fig_avg = px.line(
+        trends, x="bucket", y="avg_rating", color="category", markers=True,
+        color_discrete_sequence=palette
+    )
+    fig_avg.update_layout(yaxis_title="Average Rating", **layout)
+
+    fig_count = px.bar(
+        trends, x="bucket", y="reviews", color="category",
+        color_discrete_sequence=palette
+    )
+    fig_count.update_layout(yaxis_title="Reviews", barmode="stack", **layout)
+    return fig_avg, fig_count
+
+@st.cache_data(ttl=DERIVED_TTL, max_entries=256)
+def render_page(version: tuple, column: str, before, page_size: int, category=None, rating=None):
+    # Returns (cards_html, has_next, last_cursor) for one explorer page
+    page = load_review_page(column, before=before, limit=page_size, category=category, rating=rating)
+    has_next = len(page) > page_size
+    page = page.head(page_size)
+
+    # One markdown element per page instead of one per review
+    cards = "".join(
+        f'<div class="review-card"><div class="review-rating">{stars} ★'
+        f'{" · " + html.escape(label) if label else ""}</div>'
+        f'<div class="review-content">{html.escape(str(content or ""))}</div></div>'
+        for stars, label, content in zip(page["rating"], page["category"], page[column])
+    )
+    last_cursor = None
+    if not page.empty:
+        created_at = page["created_at"].iloc[-1]
+        if hasattr(created_at, "to_pydatetime"):
+            created_at = created_at.to_pydatetime()
+        last_cursor = (created_at, int(page["id"].iloc[-1]))
+    return cards, has_next, last_cursor
+
+@st.cache_data(ttl=DERIVED_TTL, max_entries=64)
+def render_clusters(version: tuple, page: int, page_size: int):
+    # Returns (cards_html, has_next) for one page of near-duplicate clusters,
+    # largest first; each card stands in for every review in its cluster
+    clusters = load_review_clusters(limit=(page + 1) * page_size + 1)
+    has_next = len(clusters) > (page + 1) * page_size
+    clusters = clusters[page * page_size:(page + 1) * page_size]
+
+    cards = "".join(
+        f'<div class="review-card"><div class="review-rating">'
+        f'{c["avg_rating"]} ★ avg · {c["size"]} review{"s" if c["size"] != 1 else ""}</div>'
+        f'<div class="review-content">{html.escape(c["review"])}</div></div>'
+        for c in clusters
+    )
+    return cards, has_next
+
+@st.cache_data(ttl=DERIVED_TTL, max_entries=256)
+def render_search(version: tuple, query: str, page: int, page_size: int):
+    # Returns (cards_html, has_next, hit_count_on_page) for one page of search hits
+    hits = search_reviews(query, page=page, limit=page_size)
+    has_next = len(hits) > page_size
+    hits = hits.head(page_size)
+
+    cards = "".join(
+        f'<div class="review-card"><div class="review-rating">{rating} ★</div>'
+        f'<div class="review-content">{html.escape(str(review or ""))}</div>'
+        f'<p class="caption-muted"><b>Summary:</b> {html.escape(str(summary or ""))}<br>'
+        f'<b>Action:</b> {html.escape(str(action or ""))}</p></div>'
+        for rating, review, summary, action in zip(
+            hits["rating"], hits["review"], hits["summary"], hits["recommended_action"]
+        )
+    )
+    return cards, has_next, len(hits)
+
+def _series(snapshot, kind, name):
+    return snapshot[kind].get(name, [])
+
+def operations_tables(snapshot):
+    # Per-model LLM table and per-operation DB table from a merged snapshot
+    import pandas as pd
+
+    buckets = snapshot["buckets"]
+    models = {}
+
+    def row(model):
+        return models.setdefault(model, {
+            "Model": model, "Requests": 0, "Errors": 0, "Fallbacks": 0, "Retries": 0,
+            "p50 (ms)": 0.0, "p95 (ms)": 0.0, "Prompt tokens": 0, "Completion tokens": 0,
+            "Cache hits": 0, "Cache misses": 0,
+        })
+
+    for labels, value in _series(snapshot, "counters", "llm_requests_total"):
+        r = row(labels["model"])
+        r["Requests"] += value
+        if labels["outcome"] != "ok":
+            r["Errors"] += value
+    for labels, value in _series(snapshot, "counters", "llm_fallbacks_total"):
+        row(labels["model"])["Fallbacks"] += value
+    for labels, value in _series(snapshot, "counters", "llm_tokens_total"):
+        row(labels["model"])[f"{labels['type'].title()} tokens"] += value
+    for labels, value in _series(snapshot, "counters", "llm_cache_lookups_total"):
+        row(labels["model"])["Cache hits" if labels["result"] == "hit" else "Cache misses"] += value
+    latency = {}  # blocking + streaming calls combined per model
+    for labels, hist in _series(snapshot, "histograms", "llm_request_seconds"):
+        prev = latency.get(labels["model"])
+        latency[labels["model"]] = [a + b for a, b in zip(prev, hist)] if prev else list(hist)
+    for model, hist in latency.items():
+        row(model)["p50 (ms)"] = round(histogram_quantile(0.5, buckets, hist) * 1000, 1)
+        row(model)["p95 (ms)"] = round(histogram_quantile(0.95, buckets, hist) * 1000, 1)
+    retries = sum(v for _, v in _series(snapshot, "counters", "llm_retries_total"))
+
+    db = []
+    errors = {l["op"]: v for l, v in _series(snapshot, "counters", "db_errors_total")}
+    for labels, hist in _series(snapshot, "histograms", "db_seconds"):
+        db.append({
+            "Operation": labels["op"],
+            "Calls": hist[-1],
+            "Errors": errors.get(labels["op"], 0),
+            "Avg (ms)": round(hist[-2] / hist[-1] * 1000, 2) if hist[-1] else 0.0,
+            "p95 (ms)": round(histogram_quantile(0.95, buckets, hist) * 1000, 2),
+        })
+    return pd.DataFrame(list(models.values())), pd.DataFrame(db), retries
+
 # -------------------- CSS --------------------
 st.markdown("""
 <style>
@@ -199,20 +373,57 @@ st.markdown(dashboard_icon, unsafe_allow_html=True)
 st.title("Admin Dashboard")
 st.markdown(decorative_line, unsafe_allow_html=True)
 
-# -------------------- Load data --------------------
-data = load_reviews()
+# -------------------- Live mode --------------------
+# Every section is a fragment. In live mode one small probe fragment reruns
+# on a timer and reads only the change token (PRAGMA data_version on SQLite,
+# a LISTEN/NOTIFY counter on Postgres). The data sections read the version it
+# stores and are rerun only when the token moves; everything they draw comes
+# from caches keyed by that version.
+live = st.toggle("Live mode", value=ADMIN_LIVE, help=f"Refresh sections every {LIVE_INTERVAL:g}s when feedback changes")
+run_every = LIVE_INTERVAL if live else None
+
+def refresh_version() -> bool:
+    # Stores (change token, (max id, count)); the second part is only re-read
+    # when the token has moved. Returns True if it changed.
+    token = load_change_token()
+    seen = st.session_state.get("data_version")
+    if seen is not None and seen[0] == token:
+        return False
+    st.session_state.data_version = (token, load_data_version())
+    return True
+
+def current_version() -> tuple:
+    return st.session_state.data_version
+
+@st.fragment(run_every=run_every)
+def change_probe():
+    # The full page has just probed, so the inline pass skips; timer ticks
+    # rerun the page only when the token has moved
+    if st.session_state.pop("probe_done", False):
+        return
+    if refresh_version():
+        st.rerun()
+
+refresh_version()
+st.session_state.probe_done = True
+change_probe()
+
+@st.fragment
+def overview_section():
+    version = current_version()
+    stats = cached_stats(version)
+    if stats["total"] == 0:
+        st.info("No feedback yet. Check back soon!")
+        return
 
-if data.empty:
-    st.info("No feedback yet. Check back soon!")
-else:
     # Metrics
     st.markdown("### Key Metrics")
     col1, col2, col3, col4 = st.columns(4)
 
-    avg_rating = round(data["rating"].mean(), 2)
-    total_reviews = len(data)
-    positive_reviews = (data["rating"] >= 4).sum()
-    negative_reviews = (data["rating"] <= 2).sum()
+    avg_rating = stats["average"]
+    total_reviews = stats["total"]
+    positive_reviews = stats["positive"]
+    negative_reviews = stats["negative"]
 
     with col1:
         st.markdown(f"""
@@ -248,7 +459,7 @@ else:
     # Charts
     st.markdown("### Analytics")
     chart_col1, chart_col2 = st.columns(2)
-    fig_pie, fig_bar = generate_charts(data)
+    fig_pie, fig_bar = generate_charts(version)
 
     with chart_col1:
         st.markdown("#### Rating Distribution")
@@ -257,41 +468,238 @@ else:
         st.markdown("#### Rating Frequency")
         st.plotly_chart(fig_bar, use_container_width=True, key="bar")
 
+@st.fragment
+def trends_section():
+    version = current_version()
+    if cached_stats(version)["total"] == 0:
+        return
+
+    # Trends
+    st.markdown("### Trends")
+    trend_col1, trend_col2, trend_col3 = st.columns(3)
+    with trend_col1:
+        trend_bucket = st.selectbox("Granularity", TREND_BUCKETS, format_func={"day": "Daily", "week": "Weekly"}.get)
+    with trend_col2:
+        trend_days = st.selectbox("Window", (30, 90, 180, 365), index=1, format_func=lambda d: f"Last {d} days")
+    with trend_col3:
+        trend_category = st.selectbox("Category", ("All",) + CATEGORIES, key="trend_category")
+
+    fig_avg, fig_count = trend_charts(
+        version, trend_bucket, trend_days, None if trend_category == "All" else trend_category
+    )
+    if fig_avg is None:
+        st.info("No feedback in this window.")
+    else:
+        trend_chart_col1, trend_chart_col2 = st.columns(2)
+        with trend_chart_col1:
+            st.markdown("#### Average Rating by Category")
+            st.plotly_chart(fig_avg, use_container_width=True, key="trend_avg")
+        with trend_chart_col2:
+            st.markdown("#### Review Volume by Category")
+            st.plotly_chart(fig_count, use_container_width=True, key="trend_count")
+
+@st.fragment
+def search_section():
+    version = current_version()
+
+    # Search
+    st.markdown("### Search Feedback")
+    search_query = st.text_input(
+        "Search feedback",
+        placeholder="Search reviews, summaries and recommended actions...",
+        label_visibility="collapsed"
+    ).strip()
+
+    if search_query:
+        if st.session_state.get("search_key") != search_query:
+            st.session_state.search_key = search_query
+            st.session_state.search_page = 0
+        search_page = st.session_state.search_page
+
+        results, more_results, hit_count = render_search(version, search_query, search_page, PAGE_SIZE)
+        if hit_count == 0:
+            st.info("No matching feedback.")
+        else:
+            st.markdown(results, unsafe_allow_html=True)
+            prev_col, page_col, next_col = st.columns([1, 2, 1])
+            with prev_col:
+                if st.button("← Better matches", disabled=search_page == 0, key="search_prev"):
+                    st.session_state.search_page -= 1
+                    st.rerun(scope="fragment")
+            with page_col:
+                st.markdown(f'<p class="caption-muted" style="text-align:center;">Results page {search_page + 1}</p>', unsafe_allow_html=True)
+            with next_col:
+                if st.button("More results →", disabled=not more_results, key="search_next"):
+                    st.session_state.search_page += 1
+                    st.rerun(scope="fragment")
+
+@st.fragment
+def explorer_section():
+    version = current_version()
+    if cached_stats(version)["total"] == 0:
+        return
+
     # Feedback Explorer
     st.markdown("### Feedback Explorer")
     st.markdown('<p class="view-label">Select View</p>', unsafe_allow_html=True)
 
+    views = {
+        "User Reviews": ("review", "User Reviews"),
+        "AI Responses": ("ai_response", "AI Responses"),
+        "Summaries": ("summary", "Review Summaries"),
+        "Recommended Actions": ("recommended_action", "Recommended Actions"),
+    }
     view = st.radio(
         "Select View",
-        ["User Reviews", "AI Responses", "Summaries", "Recommended Actions"],
+        list(views),
         horizontal=True,
         label_visibility="collapsed"
     )
-
-    data = data.copy()
-    data["Rating"] = data["rating"].apply(lambda x: f"{x} ★")
-
-    if view == "User Reviews":
-        display_df = data[["Rating", "review"]].rename(columns={"review": "User Review"})
-        header_text = "User Reviews"
-    elif view == "AI Responses":
-        display_df = data[["Rating", "ai_response"]].rename(columns={"ai_response": "AI Response to User"})
-        header_text = "AI Responses"
-    elif view == "Summaries":
-        display_df = data[["Rating", "summary"]].rename(columns={"summary": "AI Summary"})
-        header_text = "Review Summaries"
+    column, header_text = views[view]
+    # Off by default: the paged view is a single keyset query, while grouping
+    # builds the shared cluster index on first use
+    grouped = column == "review" and st.toggle("Group near-duplicates", value=False)
+
+    filter_col1, filter_col2, filter_col3 = st.columns(3)
+    with filter_col1:
+        explorer_category = st.selectbox("Category", ("All",) + CATEGORIES, key="explorer_category")
+    with filter_col2:
+        explorer_rating = st.selectbox("Rating", ("All", 5, 4, 3, 2, 1), key="explorer_rating")
+    with filter_col3:
+        page_sizes = sorted({10, 25, 50, 100, PAGE_SIZE})
+        page_size = st.selectbox("Reviews per page", page_sizes, index=page_sizes.index(PAGE_SIZE))
+    explorer_category = None if explorer_category == "All" else explorer_category
+    explorer_rating = None if explorer_rating == "All" else explorer_rating
+
+    # Keyset cursors: cursors[i] is the (created_at, id) before page i (None = newest).
+    # Grouped view pages by cluster rank instead, so its cursors are plain page numbers.
+    explorer_key = (column, page_size, explorer_category, explorer_rating, grouped)
+    if st.session_state.get("explorer_key") != explorer_key:
+        st.session_state.explorer_key = explorer_key
+        st.session_state.cursors = [None]
+    cursors = st.session_state.cursors
+
+    if grouped:
+        if explorer_category or explorer_rating:
+            st.markdown('<p class="caption-muted">Clusters span all reviews; filters apply to the ungrouped view.</p>', unsafe_allow_html=True)
+        cards, has_next = render_clusters(version, len(cursors) - 1, page_size)
+        last_cursor = len(cursors)
+        header_text = "Recurring Feedback"
     else:
-        display_df = data[["Rating", "recommended_action"]].rename(columns={"recommended_action": "Recommended Action"})
-        header_text = "Recommended Actions"
+        cards, has_next, last_cursor = render_page(
+            version, column, cursors[-1], page_size, explorer_category, explorer_rating
+        )
+    if not cards:
+        st.info("No feedback matches these filters.")
 
     st.markdown(f'<h4 style="text-align: center; margin-top: 2rem; margin-bottom: 1.5rem;">{header_text}</h4>', unsafe_allow_html=True)
-
-    for _, row in display_df.iterrows():
-        st.markdown(f"""
-        <div class="review-card">
-            <div class="review-rating">{row['Rating']}</div>
-            <div class="review-content">{row.iloc[1]}</div>
-        </div>
-        """, unsafe_allow_html=True)
+    st.markdown(cards, unsafe_allow_html=True)
+
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    with prev_col:
+        if st.button("← Newer", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun(scope="fragment")
+    with page_col:
+        st.markdown(f'<p class="caption-muted" style="text-align:center;">Page {len(cursors)}</p>', unsafe_allow_html=True)
+    with next_col:
+        if st.button("Older →", disabled=not has_next):
+            cursors.append(last_cursor)
+            st.rerun(scope="fragment")
+
+@st.fragment
+def export_section():
+    # Export
+    st.markdown("### Export")
+    export_col1, export_col2, export_col3, export_col4 = st.columns(4)
+    with export_col1:
+        formats = [f for f in EXPORT_FORMATS if f != "parquet" or parquet_available()]
+        export_format = st.selectbox("Format", formats, format_func=str.upper, key="export_format")
+    with export_col2:
+        export_category = st.selectbox("Category", ("All",) + CATEGORIES, key="export_category")
+    with export_col3:
+        export_rating = st.selectbox("Rating", ("All", 5, 4, 3, 2, 1), key="export_rating")
+    with export_col4:
+        export_range = st.date_input("Date range", value=(), key="export_range")
+
+    if st.button("Prepare export", key="export_prepare"):
+        # Streamlit's download button keeps whatever it serves in memory, so
+        # the dashboard only builds exports up to ADMIN_EXPORT_MAX_ROWS; the
+        # bytes live in this session's state (no temp files) and are dropped
+        # with it or when the next export replaces them
+        st.session_state.pop("export_file", None)
+        since, until = (export_range + (None, None))[:2] if export_range else (None, None)
+        buffer = io.BytesIO()
+        with st.spinner("Exporting..."):
+            # One row past the cap tells us the export is too big
+            exported = export_reviews(
+                buffer,
+                export_format,
+                category=None if export_category == "All" else export_category,
+                rating=None if export_rating == "All" else export_rating,
+                since=since,
+                until=until + timedelta(days=1) if until else None,
+                limit=ADMIN_EXPORT_MAX_ROWS + 1,
+            )
+        if exported > ADMIN_EXPORT_MAX_ROWS:
+            st.warning(
+                f"More than {ADMIN_EXPORT_MAX_ROWS:,} reviews match. "
+                f"Run `python export_reviews.py reviews.{export_format}` with the same filters instead."
+            )
+        else:
+            st.session_state.export_file = (buffer.getvalue(), export_format, exported)
+
+    export_file = st.session_state.get("export_file")
+    if export_file:
+        data, fmt, exported = export_file
+        st.download_button(
+            f"Download {exported} reviews ({fmt.upper()})",
+            data,
+            file_name=f"reviews-{date.today().isoformat()}.{fmt}",
+            mime={"csv": "text/csv", "jsonl": "application/x-ndjson"}.get(fmt, "application/octet-stream"),
+            key="export_download",
+        )
+
+overview_section()
+trends_section()
+search_section()
+explorer_section()
+export_section()
+
+# -------------------- Operations --------------------
+# Process metrics only (no database reads), so it is cheap to keep live
+@st.fragment(run_every=run_every)
+def operations_section():
+    st.markdown("### Operations")
+    ops_snapshot = merge_snapshots(collect_snapshots())
+    llm_table, db_table, llm_retries = operations_tables(ops_snapshot)
+
+    if llm_table.empty and db_table.empty:
+        st.info("No LLM or database calls recorded yet.")
+    else:
+        lookups = llm_table["Cache hits"].sum() + llm_table["Cache misses"].sum() if not llm_table.empty else 0
+        cache_rate = f"{llm_table['Cache hits'].sum() / lookups:.0%}" if lookups else "—"
+        ops_col1, ops_col2, ops_col3 = st.columns(3)
+        for col, title, value in (
+            (ops_col1, "LLM Requests", int(llm_table["Requests"].sum()) if not llm_table.empty else 0),
+            (ops_col2, "Cache Hit Rate", cache_rate),
+            (ops_col3, "LLM Retries", int(llm_retries)),
+        ):
+            with col:
+                st.markdown(f"""
+                <div class="metric-card">
+                    <div class="metric-title">{title}</div>
+                    <div class="metric-value">{value}</div>
+                </div>
+                """, unsafe_allow_html=True)
+        st.markdown("<br>", unsafe_allow_html=True)
+        st.markdown("#### LLM Calls by Model")
+        st.dataframe(llm_table, use_container_width=True, hide_index=True)
+        st.markdown("#### Database Calls")
+        st.dataframe(db_table, use_container_width=True, hide_index=True)
+        with st.expander("Prometheus metrics"):
+            st.code(render_prometheus(ops_snapshot), language="text")
+
+operations_section()
 
 st.markdown(decorative_line, unsafe_allow_html=True)
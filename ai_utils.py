@@ -1,27 +1,52 @@
 import os
-import requests
 import json
 import re
+import random
+import hashlib
+from collections import namedtuple
+from functools import lru_cache
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from cache_utils import CACHE_ENABLED, CACHE_MAX_TEMPERATURE, llm_cache, make_cache_key
+from llm_journal import get_recorder, get_replayer
+from metrics_utils import metrics
+from rate_utils import AdmissionQueue, QueueFull, SingleFlight, TokenBucket
 
 # ==================== ENV ====================
 
-GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
+# Nothing here touches the network or fails at import: the key is only
+# required once a request is actually sent (replay mode never needs it), and
+# requests/numpy are imported on first use so the pages render sooner.
 
-if not GROQ_API_KEY:
-    raise RuntimeError("GROQ_API_KEY is not set")
+def groq_api_key() -> str:
+    key = (os.environ.get("GROQ_API_KEY") or "").strip()
+    if not key:
+        raise RuntimeError("GROQ_API_KEY is not set")
+    return key
 
-GROQ_API_KEY = GROQ_API_KEY.strip()
+# Overridable so benchmarks can point at a local stand-in server
+GROQ_URL = os.environ.get("GROQ_URL", "https://api.groq.com/openai/v1/chat/completions")
 
-GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+# "split" = separate reply + insights calls, "combined" = one structured call
+AI_PIPELINE = os.environ.get("AI_PIPELINE", "split").strip().lower()
 
-HEADERS = {
-    "Authorization": f"Bearer {GROQ_API_KEY}",
-    "Content-Type": "application/json",
-}
+# Size of the shared LLM thread pools
+LLM_WORKERS = int(os.environ.get("LLM_WORKERS", "8"))
+
+def groq_headers() -> dict:
+    return {
+        "Authorization": f"Bearer {groq_api_key()}",
+        "Content-Type": "application/json",
+    }
 
 # Use most stable Groq model (FIXED: Updated model name)
 USER_MODEL = "llama-3.3-70b-versatile"
 ADMIN_MODEL = "llama-3.3-70b-versatile"
+# Small model for short acknowledgements (see MODEL ROUTING)
+FAST_MODEL = os.environ.get("GROQ_FAST_MODEL", "llama-3.1-8b-instant")
 
 # ==================== QUERY DETECTION ====================
 
@@ -31,52 +56,607 @@ QUERY_KEYWORDS = [
     "tell me", "show me", "does", "do you", "should i"
 ]
 
+# Whole words/phrases only, so "shower" or "however" no longer count as questions
+_QUERY_PATTERN = re.compile(
+    r"\b(?:" + "|".join(re.escape(k).replace(r"\ ", r"\s+") for k in QUERY_KEYWORDS) + r")\b",
+    re.IGNORECASE,
+)
+
+@lru_cache(maxsize=4096)
 def is_query(text: str) -> bool:
-    text = text.lower()
     if "?" in text:
         return True
-    # FIXED: Changed from >= 2 to >= 1 to correctly detect single-keyword questions like "how do i login"
-    return sum(k in text for k in QUERY_KEYWORDS) >= 1
+    # A single keyword is enough, e.g. "how do i login"
+    return _QUERY_PATTERN.search(text) is not None
 
-# ==================== CORE GROQ CALL ====================
+# ==================== LOCAL FAST PATH ====================
+
+# Short, clearly positive/negative feedback that agrees with its rating is
+# answered from templates without any network call.
+LOCAL_FAST_PATH = os.environ.get("LOCAL_FAST_PATH", "1") == "1"
+FAST_PATH_MAX_WORDS = int(os.environ.get("FAST_PATH_MAX_WORDS", "12"))
+FAST_PATH_MIN_CONFIDENCE = float(os.environ.get("FAST_PATH_MIN_CONFIDENCE", "0.8"))
+
+POSITIVE_WORDS = [
+    "great", "good", "love", "loved", "loving", "awesome", "amazing", "excellent", "perfect",
+    "nice", "fantastic", "wonderful", "best", "helpful", "easy", "smooth", "fast", "happy",
+    "thanks", "thank you", "cool", "brilliant", "superb", "useful", "recommend",
+]
+NEGATIVE_WORDS = [
+    "bad", "terrible", "awful", "horrible", "worst", "hate", "hated", "slow", "broken",
+    "bug", "buggy", "crash", "crashes", "crashing", "useless", "poor", "annoying",
+    "disappointed", "disappointing", "frustrating", "error", "fails", "failed", "refund",
+    "scam", "waste",
+]
+# Anything that can flip or qualify sentiment sends the review to the LLM
+HEDGE_WORDS = ["not", "no", "never", "but", "although", "though", "except", "however", "don't", "didn't", "isn't", "wasn't", "can't", "won't"]
+
+def _word_pattern(words):
+    return re.compile(
+        r"\b(?:" + "|".join(re.escape(w).replace(r"\ ", r"\s+") for w in words) + r")\b",
+        re.IGNORECASE,
+    )
 
-def call_llm(prompt, model, max_tokens=120, temperature=0.4):
-    payload = {
-    "model": model,
-    "messages": [
-        {"role": "user", "content": prompt}
-    ],
-    "max_tokens": max_tokens,
-    "temperature": temperature,
-    "top_p": 1,
-    "stream": False
+_POSITIVE_PATTERN = _word_pattern(POSITIVE_WORDS)
+_NEGATIVE_PATTERN = _word_pattern(NEGATIVE_WORDS)
+_HEDGE_PATTERN = _word_pattern(HEDGE_WORDS)
+
+LocalVerdict = namedtuple("LocalVerdict", "category sentiment confidence")
+
+def classify_feedback(review: str, rating=None) -> LocalVerdict:
+    if is_query(review):
+        return LocalVerdict("query", "neutral", 1.0)
+
+    positive = len(_POSITIVE_PATTERN.findall(review))
+    negative = len(_NEGATIVE_PATTERN.findall(review))
+    if positive > negative:
+        sentiment = "positive"
+    elif negative > positive:
+        sentiment = "negative"
+    else:
+        sentiment = "neutral"
+
+    # Start from lexicon evidence, then require agreement with the star rating
+    confidence = 0.5 if sentiment == "neutral" else 0.6 + 0.1 * min(abs(positive - negative), 2)
+    if rating is not None:
+        rating = int(rating)
+        agrees = (sentiment == "positive" and rating >= 4) or (sentiment == "negative" and rating <= 2)
+        confidence += 0.2 if agrees else -0.4
+    if positive and negative:
+        confidence -= 0.3
+    if _HEDGE_PATTERN.search(review):
+        confidence -= 0.4
+    if len(review.split()) > FAST_PATH_MAX_WORDS:
+        confidence -= 0.4
+
+    category = sentiment if sentiment != "neutral" else "query"
+    return LocalVerdict(category, sentiment, round(max(0.0, min(1.0, confidence)), 2))
+
+FAST_REPLIES = {
+    "positive": (
+        "Thank you so much for the kind words — we're thrilled you're enjoying it!",
+        "Thanks a lot for your feedback, it truly made our day!",
+        "We really appreciate your support — thank you!",
+    ),
+    "negative": (
+        "We're sorry about your experience — our team will look into it right away.",
+        "Sorry for the trouble; we're on it and will make this right.",
+        "We apologize for the frustration and are working to fix it.",
+    ),
+}
+FAST_ACTIONS = {
+    "positive": "No action needed; thank the customer.",
+    "negative": "Follow up with the customer and investigate the reported issue.",
 }
 
+def local_fast_path(review: str, rating=None):
+    # Returns (reply, category, summary, action) when the LLM isn't needed, else None
+    if not LOCAL_FAST_PATH:
+        return None
+    verdict = classify_feedback(review, rating)
+    if verdict.category == "query" or verdict.confidence < FAST_PATH_MIN_CONFIDENCE:
+        return None
+    # Stable choice so resubmits of the same text get the same reply
+    replies = FAST_REPLIES[verdict.category]
+    digest = hashlib.md5(review.strip().lower().encode("utf-8")).digest()
+    label = "Positive" if verdict.category == "positive" else "Negative"
+    stars = f" ({int(rating)}★)" if rating is not None else ""
+    return (
+        replies[digest[0] % len(replies)],
+        verdict.category,
+        f"{label} feedback{stars}: {fallback_summary(review.strip())}",
+        FAST_ACTIONS[verdict.category],
+    )
+
+# ==================== HTTP CLIENT ====================
+
+HTTP_POOL_SIZE = int(os.environ.get("GROQ_POOL_SIZE", "16"))
+MAX_RETRIES = int(os.environ.get("GROQ_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.environ.get("GROQ_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.environ.get("GROQ_BACKOFF_MAX", "8"))
+RETRY_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+CONNECT_TIMEOUT = float(os.environ.get("GROQ_CONNECT_TIMEOUT", "3"))
+# Below this much remaining budget a new request isn't worth starting
+MIN_REQUEST_SECONDS = 0.05
+
+# ==================== ADMISSION CONTROL ====================
+
+# Process-wide limiter in front of every Groq request (retries included),
+# sized to the account quota in requests per minute; 0 disables it
+GROQ_RPM = float(os.environ.get("GROQ_RPM", "600"))
+GROQ_BURST = float(os.environ.get("GROQ_BURST", "20"))
+# Longest a request waits for quota when the caller gave no deadline
+GROQ_QUOTA_WAIT = float(os.environ.get("GROQ_QUOTA_WAIT", "10"))
+
+groq_bucket = TokenBucket(GROQ_RPM / 60, capacity=GROQ_BURST) if GROQ_RPM > 0 else None
+
+# Identical prompts already in flight share one request
+_inflight = SingleFlight()
+
+class QuotaExhausted(Exception):
+    pass
+
+def acquire_quota(deadline=None):
+    if groq_bucket is None:
+        return
+    wait_for = GROQ_QUOTA_WAIT if deadline is None else min(GROQ_QUOTA_WAIT, deadline.remaining())
+    started = time.perf_counter()
+    if not groq_bucket.acquire(timeout=wait_for):
+        metrics.inc("llm_throttled_total")
+        raise QuotaExhausted(f"no Groq quota within {wait_for:.1f}s")
+    metrics.observe("llm_quota_wait_seconds", time.perf_counter() - started)
+
+# ==================== DEADLINES ====================
+
+class DeadlineExceeded(Exception):
+    pass
+
+class Deadline:
+    # End-to-end latency budget shared by every call made for one submission
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self):
+        # (connect, read) timeout for the next request, capped by what is left
+        remaining = self.remaining()
+        if remaining < MIN_REQUEST_SECONDS:
+            raise DeadlineExceeded(f"{self.seconds:.1f}s budget exhausted")
+        return (min(CONNECT_TIMEOUT, remaining), remaining)
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_http_session():
+    # One keep-alive pool per process, shared across Streamlit sessions and threads
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=HTTP_POOL_SIZE,
+                    max_retries=0,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(groq_headers())
+                _session = session
+    return _session
+
+def warm_up_http():
+    # Opens a pooled keep-alive connection (DNS + TLS) before the first real
+    # request; any status code will do, only the socket matters
+    if get_replayer() is not None:
+        return
     try:
-        r = requests.post(
-            GROQ_URL,
-            headers=HEADERS,
-            json=payload,
-            timeout=30
-        )
-        r.raise_for_status()
-        return r.json()["choices"][0]["message"]["content"].strip()
+        get_http_session().head(GROQ_URL, timeout=CONNECT_TIMEOUT)
+    except Exception as e:
+        print("⚠️ GROQ WARM-UP FAILED:", e)
+
+def _retry_after_seconds(response):
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _backoff_delay(attempt: int, response=None) -> float:
+    retry_after = _retry_after_seconds(response)
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX)
+    # Full jitter: uniform in [0, base * 2^attempt]
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+def post_with_retry(payload, timeout=30, stream=False, deadline=None):
+    import requests
+
+    session = get_http_session()
+    for attempt in range(MAX_RETRIES + 1):
+        r = None
+        acquire_quota(deadline)
+        if deadline is not None:
+            timeout = deadline.timeout()
+        try:
+            r = session.post(GROQ_URL, json=payload, timeout=timeout, stream=stream)
+            if r.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                r.raise_for_status()
+                return r
+            print(f"⚠️ GROQ {r.status_code}, retrying ({attempt + 1}/{MAX_RETRIES})")
+            metrics.inc("llm_retries_total", reason=str(r.status_code))
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            print(f"⚠️ GROQ {type(e).__name__}, retrying ({attempt + 1}/{MAX_RETRIES})")
+            metrics.inc("llm_retries_total", reason=type(e).__name__)
+        delay = _backoff_delay(attempt, r)
+        if r is not None:
+            r.close()
+        if deadline is not None and delay >= deadline.remaining():
+            raise DeadlineExceeded("no budget left to retry")
+        time.sleep(delay)
+
+# ==================== CORE GROQ CALL ====================
 
+def _out_of_budget(error, deadline) -> bool:
+    # The request was cut short by the caller's deadline rather than failing
+    if isinstance(error, DeadlineExceeded):
+        return True
+    import requests
+    return (
+        isinstance(error, requests.exceptions.Timeout)
+        and deadline is not None
+        and deadline.remaining() < MIN_REQUEST_SECONDS
+    )
+
+def _cached(key, model):
+    if key is None:
+        return None
+    cached = llm_cache.get(key)
+    metrics.inc("llm_cache_lookups_total", model=model, result="miss" if cached is None else "hit")
+    return cached
+
+def _record_usage(model, usage):
+    # Groq returns OpenAI-style usage: prompt_tokens / completion_tokens
+    for kind in ("prompt", "completion"):
+        tokens = (usage or {}).get(f"{kind}_tokens")
+        if tokens:
+            metrics.inc("llm_tokens_total", tokens, model=model, type=kind)
+
+def build_payload(prompt, model, max_tokens, temperature, stream=False):
+    return {
+        "model": model,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "top_p": 1,
+        "stream": stream,
+    }
+
+def call_llm(prompt, model, max_tokens=120, temperature=0.4, use_cache=None, deadline=None, coalesce=True):
+    # use_cache=None -> cache unless the temperature is too high to be repeatable
+    if use_cache is None:
+        use_cache = CACHE_ENABLED and temperature <= CACHE_MAX_TEMPERATURE
+
+    key = make_cache_key(prompt, model, max_tokens, temperature) if use_cache else None
+    cached = _cached(key, model)
+    if cached is not None:
+        return cached
+
+    if not coalesce:
+        return _request_llm(prompt, model, max_tokens, temperature, key, deadline)
+
+    flight_key = key or make_cache_key(prompt, model, max_tokens, temperature)
+    leader, flight = _inflight.begin(flight_key)
+    if not leader:
+        metrics.inc("llm_coalesced_total", model=model)
+        return _inflight.wait(flight, deadline.remaining() if deadline is not None else None) or ""
+    content = ""
+    try:
+        content = _request_llm(prompt, model, max_tokens, temperature, key, deadline)
+        return content
+    finally:
+        _inflight.finish(flight_key, flight, content)
+
+def _request_llm(prompt, model, max_tokens, temperature, key, deadline):
+    import requests
+
+    payload = build_payload(prompt, model, max_tokens, temperature, stream=False)
+    recorder, replayer = get_recorder(), get_replayer()
+
+    started = time.perf_counter()
+    content, usage, outcome = "", None, "error"
+    try:
+        if replayer is not None:
+            content, usage = replayer.replay(payload)
+            content = content.strip()
+        else:
+            r = post_with_retry(payload, timeout=30, deadline=deadline)
+            body = r.json()
+            content = body["choices"][0]["message"]["content"].strip()
+            usage = body.get("usage")
+        _record_usage(model, usage)
+        outcome = "ok" if content else "empty"
+        metrics.inc("llm_requests_total", model=model, outcome=outcome)
+        # Empty/failed completions are never cached so the next call retries
+        if key is not None and content:
+            llm_cache.set(key, content)
+        return content
+
+    except DeadlineExceeded as e:
+        print("⏱️ GROQ DEADLINE:", e)
+        outcome = "deadline"
+        metrics.inc("llm_requests_total", model=model, outcome=outcome)
+        return ""
+    except QuotaExhausted as e:
+        print("⏳ GROQ THROTTLED:", e)
+        outcome = "throttled"
+        metrics.inc("llm_requests_total", model=model, outcome=outcome)
+        return ""
     except requests.exceptions.HTTPError as e:
-        # 🚨 FIXED: Indentation corrected
         print("❌ GROQ HTTP ERROR:", e)
-        # 🚨 FIXED: Used 'r.text' for the response body
-        print("❌ GROQ RESPONSE BODY:", r.text) 
+        print("❌ GROQ RESPONSE BODY:", e.response.text if e.response is not None else "")
+        outcome = "http_error"
+        metrics.inc("llm_requests_total", model=model, outcome=outcome)
         return ""
     except Exception as e:
-        # Added a general exception handler for non-HTTP errors (e.g., Timeout)
-        print("❌ GROQ GENERAL ERROR:", e)
+        if _out_of_budget(e, deadline):
+            print("⏱️ GROQ DEADLINE:", e)
+            outcome = "deadline"
+        else:
+            # Added a general exception handler for non-HTTP errors (e.g., Timeout)
+            print("❌ GROQ GENERAL ERROR:", e)
+        metrics.inc("llm_requests_total", model=model, outcome=outcome)
+        return ""
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe("llm_request_seconds", elapsed, model=model, mode="blocking")
+        if outcome not in ("throttled", "deadline"):
+            # Our own quota or the caller's budget running out says nothing
+            # about the model's health
+            router.record(model, elapsed, ok=bool(content))
+        if recorder is not None:
+            recorder.record(payload, content, usage, elapsed, outcome)
+
+
+# ==================== STREAMING GROQ CALL ====================
+
+def stream_llm(prompt, model, max_tokens=120, temperature=0.4, use_cache=None, deadline=None):
+    # Yields content deltas from the SSE stream. Errors propagate to the
+    # caller so it can decide whether a fallback is still possible. The
+    # deadline bounds the wait for the first token; once tokens are flowing
+    # the stream is allowed to finish.
+    if use_cache is None:
+        use_cache = CACHE_ENABLED and temperature <= CACHE_MAX_TEMPERATURE
+
+    key = make_cache_key(prompt, model, max_tokens, temperature) if use_cache else None
+    cached = _cached(key, model)
+    if cached is not None:
+        yield cached
+        return
+
+    # A follower gets the leader's finished text in one piece
+    flight_key = key or make_cache_key(prompt, model, max_tokens, temperature)
+    leader, flight = _inflight.begin(flight_key)
+    if not leader:
+        metrics.inc("llm_coalesced_total", model=model)
+        content = _inflight.wait(flight, deadline.remaining() if deadline is not None else None)
+        if content:
+            yield content
+        return
+    parts, completed = [], False
+    try:
+        for delta in _stream_request(prompt, model, max_tokens, temperature, key, deadline):
+            parts.append(delta)
+            yield delta
+        completed = True
+    finally:
+        # Only a complete answer is worth sharing; "" sends followers to their fallback
+        _inflight.finish(flight_key, flight, "".join(parts).strip() if completed else "")
+
+def _stream_request(prompt, model, max_tokens, temperature, key, deadline):
+    payload = build_payload(prompt, model, max_tokens, temperature, stream=True)
+    recorder, replayer = get_recorder(), get_replayer()
+    parts = []
+    usage, outcome = None, "abandoned"  # caller stopped reading before the end
+    started = time.perf_counter()
+    try:
+        if replayer is not None:
+            # Replayed word by word so the UI streams exactly as it would live
+            recorded, usage = replayer.replay(payload)
+            _record_usage(model, usage)
+            for delta in re.findall(r"\S+\s*", recorded):
+                parts.append(delta)
+                yield delta
+        else:
+            with post_with_retry(payload, timeout=30, stream=True, deadline=deadline) as r:
+                for line in r.iter_lines(decode_unicode=True):
+                    if not parts and deadline is not None and deadline.expired():
+                        raise DeadlineExceeded("no token before the deadline")
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    # Groq reports usage on the last chunk under x_groq
+                    chunk_usage = chunk.get("usage") or chunk.get("x_groq", {}).get("usage")
+                    if chunk_usage:
+                        usage = chunk_usage
+                        _record_usage(model, usage)
+                    choices = chunk.get("choices") or [{}]
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        if not parts:
+                            metrics.observe("llm_first_token_seconds", time.perf_counter() - started, model=model)
+                        parts.append(delta)
+                        yield delta
+        outcome = "ok" if "".join(parts).strip() else "empty"
+    except QuotaExhausted:
+        outcome = "throttled"
+        metrics.inc("llm_requests_total", model=model, outcome=outcome)
+        raise
+    except Exception as e:
+        outcome = "deadline" if _out_of_budget(e, deadline) else "error"
+        metrics.inc("llm_requests_total", model=model, outcome=outcome)
+        if outcome == "error":
+            router.record(model, time.perf_counter() - started, ok=False)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe("llm_request_seconds", elapsed, model=model, mode="stream")
+        if recorder is not None:
+            recorder.record(payload, "".join(parts).strip(), usage, elapsed, outcome, stream=True)
+    router.record(model, time.perf_counter() - started, ok=bool(parts))
+
+    content = "".join(parts).strip()
+    metrics.inc("llm_requests_total", model=model, outcome="ok" if content else "empty")
+    if key is not None and content:
+        llm_cache.set(key, content)
+
+# ==================== MODEL ROUTING ====================
+
+# Route short acknowledgements to FAST_MODEL and questions/insights to the big
+# model, skipping models that are currently slow or erroring.
+LLM_ROUTING = os.environ.get("LLM_ROUTING", "1") == "1"
+# A model whose recent p95 exceeds this (seconds) is treated as degraded
+SLOW_MODEL_SECONDS = float(os.environ.get("LLM_SLOW_SECONDS", "6"))
+MAX_ERROR_RATE = float(os.environ.get("LLM_MAX_ERROR_RATE", "0.5"))
+# Hedging: if the first request hasn't answered after ~p95, fire a second one
+LLM_HEDGE = os.environ.get("LLM_HEDGE", "0") == "1"
+HEDGE_DEFAULT_DELAY = float(os.environ.get("LLM_HEDGE_DELAY", "1.5"))
+ROUTER_WINDOW = 50
+ROUTER_MIN_SAMPLES = 5
+# Older samples are ignored so a degraded model gets retried once it ages out
+ROUTER_SAMPLE_TTL = float(os.environ.get("LLM_ROUTER_SAMPLE_TTL", "120"))
+
+class ModelRouter:
+    def __init__(self, window=ROUTER_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}  # model -> deque[(recorded_at, seconds, ok)]
+
+    def record(self, model: str, seconds: float, ok: bool):
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(
+                (time.monotonic(), seconds, ok)
+            )
+
+    def _recent(self, model: str) -> list:
+        cutoff = time.monotonic() - ROUTER_SAMPLE_TTL
+        with self._lock:
+            return [(t, ok) for at, t, ok in self._samples.get(model, ()) if at >= cutoff]
+
+    def p95(self, model: str):
+        samples = [t for t, ok in self._recent(model) if ok]
+        if len(samples) < ROUTER_MIN_SAMPLES:
+            return None
+        samples.sort()
+        return samples[int(0.95 * (len(samples) - 1))]
+
+    def error_rate(self, model: str) -> float:
+        samples = self._recent(model)
+        if len(samples) < ROUTER_MIN_SAMPLES:
+            return 0.0
+        return sum(1 for _, ok in samples if not ok) / len(samples)
+
+    def healthy(self, model: str) -> bool:
+        p95 = self.p95(model)
+        return self.error_rate(model) < MAX_ERROR_RATE and (p95 is None or p95 < SLOW_MODEL_SECONDS)
+
+    def candidates(self, kind: str) -> list:
+        # kind: "ack" (short non-query reply), "query" or "insights"
+        if not LLM_ROUTING:
+            return [ADMIN_MODEL if kind == "insights" else USER_MODEL]
+        big = ADMIN_MODEL if kind == "insights" else USER_MODEL
+        preferred = [FAST_MODEL, big] if kind == "ack" else [big, FAST_MODEL]
+        # Stable sort: healthy models first, preference order otherwise kept
+        return sorted(dict.fromkeys(preferred), key=lambda m: not self.healthy(m))
+
+    def hedge_delay(self, model: str) -> float:
+        p95 = self.p95(model)
+        return p95 if p95 is not None else HEDGE_DEFAULT_DELAY
+
+router = ModelRouter()
+
+# Primaries and hedges get separate pools, so a backlog of slow primaries
+# can never delay the hedges meant to rescue them
+_primary_executor = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="llm-primary")
+_hedge_executor = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="llm-hedge")
+
+def call_llm_hedged(prompt, model, backup_model=None, max_tokens=120, temperature=0.4, deadline=None):
+    first = _primary_executor.submit(call_llm, prompt, model, max_tokens, temperature, None, deadline)
+    hedge_delay = router.hedge_delay(model)
+    if deadline is not None:
+        hedge_delay = min(hedge_delay, deadline.remaining())
+    done, _ = wait([first], timeout=hedge_delay)
+    if done and first.result():
+        return first.result()
+    if deadline is not None and deadline.expired():
         return ""
 
+    metrics.inc("llm_hedges_total", model=backup_model or model)
+    # Never coalesced: with the same model it would just wait on the request it backs up
+    second = _hedge_executor.submit(
+        call_llm, prompt, backup_model or model, max_tokens, temperature, None, deadline, False
+    )
+    pending = {first, second}
+    while pending:
+        done, pending = wait(
+            pending,
+            timeout=deadline.remaining() if deadline is not None else None,
+            return_when=FIRST_COMPLETED,
+        )
+        if not done:
+            return ""  # budget spent; both requests finish in the background
+        for future in done:
+            content = future.result()
+            if content:
+                return content  # the slower request finishes in the background
+    return ""
+
+def routed_llm(prompt, kind, max_tokens=120, temperature=0.4, deadline=None):
+    # Tries candidate models in order until one answers or the budget runs out
+    candidates = router.candidates(kind)
+    for i, model in enumerate(candidates):
+        if deadline is not None and deadline.expired():
+            break
+        if LLM_HEDGE:
+            backup = candidates[i + 1] if i + 1 < len(candidates) else model
+            content = call_llm_hedged(prompt, model, backup, max_tokens, temperature, deadline)
+        else:
+            content = call_llm(prompt, model, max_tokens=max_tokens, temperature=temperature,
+                               deadline=deadline)
+        if content:
+            return content
+        metrics.inc("llm_failovers_total", model=model, kind=kind)
+    return ""
+
+def reply_kind(review: str) -> str:
+    return "query" if is_query(review) else "ack"
 
 # ==================== USER RESPONSE (USED IN UI) ====================
 
-def generate_user_reply(review: str, rating=None) -> str:
+def user_reply_request(review: str):
+    # Returns (prompt, max_tokens, temperature) for the user-facing reply
     if is_query(review):
         prompt = f"""
 You are a polite customer support assistant.
@@ -85,9 +665,9 @@ Answer clearly in 2–3 short sentences (max 50 words).
 Customer question:
 "{review}"
 """
-        response = call_llm(prompt, USER_MODEL, max_tokens=120, temperature=0.6)
-    else:
-        prompt = f"""
+        return prompt, 120, 0.6
+
+    prompt = f"""
 You are a customer support assistant.
 Reply in ONE sentence (max 15 words).
 
@@ -97,20 +677,78 @@ If negative → apologize sincerely.
 Customer feedback:
 "{review}"
 """
-        response = call_llm(prompt, USER_MODEL, max_tokens=40, temperature=0.4)
+    return prompt, 40, 0.4
+
+def generate_user_reply(review: str, rating=None, deadline=None) -> str:
+    # Blocking form of stream_user_reply, kept for callers that want the whole text
+    return "".join(stream_user_reply(review, rating, deadline=deadline)).strip()
+
+def stream_user_reply(review: str, rating=None, deadline=None):
+    fast = local_fast_path(review, rating)
+    if fast:
+        metrics.inc("llm_fast_path_total", kind="reply")
+        yield fast[0]
+        return
+
+    prompt, max_tokens, temperature = user_reply_request(review)
+    started = False
+    for model in router.candidates(reply_kind(review)):
+        if deadline is not None and deadline.expired():
+            break
+        try:
+            for delta in stream_llm(prompt, model, max_tokens=max_tokens, temperature=temperature,
+                                    deadline=deadline):
+                if not started:
+                    # Leading whitespace would render as an empty first frame
+                    delta = delta.lstrip()
+                    if not delta:
+                        continue
+                    started = True
+                yield delta
+        except Exception as e:
+            print("❌ GROQ STREAM ERROR:", e)
+        if started:
+            break
+        # Nothing shown yet, so the next model can still take over
+        metrics.inc("llm_failovers_total", model=model, kind=reply_kind(review))
+
+    # Canned text only if nothing reached the user yet
+    if not started:
+        metrics.inc("llm_fallbacks_total", model=USER_MODEL, kind="reply")
+        yield fallback_reply(review)
 
-    if not response:
-        return (
-            "Thank you for reaching out. Our team will assist you shortly."
-            if is_query(review)
-            else "Thank you for your feedback. We appreciate it."
-        )
+# ==================== ADMIN INSIGHTS (USED IN UI) ====================
 
-    return response
+# Near-identical repeats of a recent review (REUSE_THRESHOLD) reuse its insights instead of
+# making another LLM call
+DEDUP_INSIGHTS = os.environ.get("DEDUP_INSIGHTS", "1") == "1"
+DEDUP_CAPACITY = int(os.environ.get("DEDUP_CAPACITY", "5000"))
 
-# ==================== ADMIN INSIGHTS (USED IN UI) ====================
+_recent_insights = None
+_recent_insights_lock = threading.Lock()
+
+def get_recent_insights():
+    # Built on first use so importing ai_utils does not pull in NumPy
+    global _recent_insights
+    if _recent_insights is None:
+        with _recent_insights_lock:
+            if _recent_insights is None:
+                from similarity_utils import NearDuplicateIndex
+                _recent_insights = NearDuplicateIndex(capacity=DEDUP_CAPACITY)
+    return _recent_insights
 
 def generate_admin_insights(review: str, rating=None):
+    fast = local_fast_path(review, rating)
+    if fast:
+        metrics.inc("llm_fast_path_total", kind="insights")
+        return fast[1:]
+
+    if DEDUP_INSIGHTS:
+        reused = get_recent_insights().lookup(review)
+        if reused:
+            metrics.inc("llm_dedup_hits_total", kind="insights")
+            return reused
+
     prompt = f"""
 Analyze the feedback and return ONLY valid JSON:
 
@@ -124,26 +762,137 @@ Feedback:
 "{review}"
 """
 
-    raw = call_llm(prompt, ADMIN_MODEL, max_tokens=180, temperature=0.3)
+    parsed = parse_json_object(routed_llm(prompt, "insights", max_tokens=180, temperature=0.3))
+    if not parsed:
+        metrics.inc("llm_fallbacks_total", model=ADMIN_MODEL, kind="insights")
+        return fallback_category(review, rating), fallback_summary(review), fallback_action()
+
+    # Persisted and faceted on, so only the known labels are allowed through
+    category = _field(parsed, "category").lower()
+    if category not in CATEGORIES:
+        category = fallback_category(review, rating)
+    insights = (
+        category,
+        _field(parsed, "summary") or fallback_summary(review),
+        _field(parsed, "recommended_action") or fallback_action(),
+    )
 
-    match = re.search(r"\{[\s\S]*\}", raw)
+    if DEDUP_INSIGHTS:
+        get_recent_insights().add(review, insights)
+    return insights
+
+# ==================== COMBINED CALL ====================
+
+CATEGORIES = ("positive", "negative", "query")
+
+_JSON_OBJECT = re.compile(r"\{[\s\S]*\}")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+def parse_json_object(raw: str) -> dict:
+    match = _JSON_OBJECT.search(raw or "")
     if not match:
-        return "query", fallback_summary(review), fallback_action()
+        return {}
+    text = match.group()
+    for candidate in (text, _TRAILING_COMMA.sub(r"\1", text)):
+        try:
+            parsed = json.loads(candidate)
+            return parsed if isinstance(parsed, dict) else {}
+        except ValueError:
+            pass
+    # Last resort: pull out whichever string fields are still readable
+    fields = {}
+    for name, value in re.findall(r'"(\w+)"\s*:\s*"((?:[^"\\]|\\.)*)"', text):
+        try:
+            fields[name] = json.loads(f'"{value}"')
+        except ValueError:
+            fields[name] = value
+    return fields
+
+def _field(parsed: dict, name: str) -> str:
+    value = parsed.get(name)
+    return value.strip() if isinstance(value, str) else ""
+
+def fallback_category(review: str, rating=None) -> str:
+    if is_query(review):
+        return "query"
+    if rating is not None and int(rating) <= 2:
+        return "negative"
+    return "positive" if rating is not None and int(rating) >= 4 else "query"
+
+def generate_review_bundle(review: str, rating=None):
+    # One request for reply + insights; returns (reply, category, summary, action)
+    fast = local_fast_path(review, rating)
+    if fast:
+        metrics.inc("llm_fast_path_total", kind="bundle")
+        return fast
+
+    reply_style = (
+        "answer clearly in 2–3 short sentences (max 50 words)"
+        if is_query(review)
+        else "reply in ONE sentence (max 15 words): thank warmly if positive, apologize sincerely if negative"
+    )
+    prompt = f"""
+You are a customer support assistant. Return ONLY valid JSON:
 
-    try:
-        parsed = json.loads(match.group())
-        return (
-            parsed.get("category", "query"),
-            parsed.get("summary", fallback_summary(review)),
-            parsed.get("recommended_action", fallback_action())
-        )
-    except Exception:
-        return "query", fallback_summary(review), fallback_action()
+{{
+  "reply": "message to the customer; {reply_style}",
+  "category": "positive | negative | query",
+  "summary": "short summary",
+  "recommended_action": "action to take"
+}}
+
+Rating: {rating if rating is not None else "n/a"}
+Feedback:
+"{review}"
+"""
+
+    parsed = parse_json_object(routed_llm(prompt, "insights", max_tokens=260, temperature=0.4))
+    if not parsed:
+        metrics.inc("llm_fallbacks_total", model=USER_MODEL, kind="bundle")
+
+    category = _field(parsed, "category").lower()
+    if category not in CATEGORIES:
+        category = fallback_category(review, rating)
+
+    return (
+        _field(parsed, "reply") or fallback_reply(review),
+        category,
+        _field(parsed, "summary") or fallback_summary(review),
+        _field(parsed, "recommended_action") or fallback_action(),
+    )
 
 # ==================== FALLBACKS ====================
 
+def fallback_reply(review: str) -> str:
+    return (
+        "Thank you for reaching out. Our team will assist you shortly."
+        if is_query(review)
+        else "Thank you for your feedback. We appreciate it."
+    )
+
 def fallback_summary(review: str) -> str:
     return review[:80] + ("..." if len(review) > 80 else "")
 
 def fallback_action() -> str:
     return "Review feedback and take appropriate action."
+
+# ==================== CONCURRENT EXECUTION ====================
+
+# Shared by every Streamlit session in the process
+_executor = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="llm")
+
+def submit_review_bundle(review: str, rating=None):
+    return _executor.submit(generate_review_bundle, review, rating)
+
+def submit_admin_insights(review: str, rating=None):
+    # Used when the reply is streamed on the script thread
+    return _executor.submit(generate_admin_insights, review, rating)
+
+# Submissions working on the LLM at once; the next SUBMIT_MAX_WAITING wait
+# in line and are shown their place, anyone beyond that gets the local fallback.
+# Time in line counts against the submission's reply budget, so a user who is
+# not admitted in time also gets the local fallback.
+SUBMIT_MAX_ACTIVE = int(os.environ.get("SUBMIT_MAX_ACTIVE", str(LLM_WORKERS)))
+SUBMIT_MAX_WAITING = int(os.environ.get("SUBMIT_MAX_WAITING", "50"))
+
+submission_queue = AdmissionQueue(SUBMIT_MAX_ACTIVE, SUBMIT_MAX_WAITING)
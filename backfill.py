@@ -0,0 +1,170 @@
+# backfill.py
+# Regenerate admin insights for existing reviews, or import historical feedback.
+#
+#   python backfill.py db                       # reprocess public.reviews in place
+#   python backfill.py reviews.csv              # import a CSV export
+#   python backfill.py history.jsonl --rate 5   # import JSONL, max 5 requests/s
+#
+# Progress is checkpointed after every committed batch, so an interrupted run
+# picks up where it stopped. Use --reset to start over. Near-duplicate reviews
+# within a batch share one insights call unless --no-dedup is given.
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from ai_utils import generate_admin_insights
+from data_utils import iter_review_batches, save_reviews, update_review_insights
+from rate_utils import TokenBucket
+from similarity_utils import REUSE_THRESHOLD, cluster_texts
+
+CHECKPOINT_PATH = ".backfill_checkpoint.json"
+
+# ==================== CHECKPOINT ====================
+
+def load_checkpoint(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_checkpoint(path: str, state: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)  # atomic, never leaves a half-written checkpoint
+
+# ==================== SOURCES ====================
+
+def _file_record(row: dict):
+    review = (row.get("review") or row.get("body") or row.get("text") or "").strip()
+    if not review:
+        return None
+    try:
+        rating = int(row.get("rating") or 0)
+    except (TypeError, ValueError):
+        rating = 0
+    return {
+        "rating": rating,
+        "review": review,
+        "ai_response": row.get("ai_response") or "",
+    }
+
+def _import_key(path: str, offset: int) -> str:
+    # Same file + same source row -> same key, so a batch written just before
+    # a crash is skipped when the import resumes from the last checkpoint
+    return hashlib.sha256(f"{os.path.abspath(path)}\n{offset}".encode("utf-8")).hexdigest()
+
+def iter_file_rows(path: str):
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".jsonl"):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for offset, row in enumerate(rows):
+            record = _file_record(row)
+            if record is not None:
+                record["idempotency_key"] = _import_key(path, offset)
+            yield record
+
+def iter_file_batches(path: str, offset: int, batch_size: int):
+    # Yields (next_offset, records); offset counts source rows, including skipped ones
+    rows = islice(iter_file_rows(path), offset, None)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            return
+        offset += len(chunk)
+        yield offset, [r for r in chunk if r is not None]
+
+# ==================== PIPELINE ====================
+
+def make_worker(bucket: TokenBucket):
+    def work(record):
+        bucket.acquire()
+        category, summary, action = generate_admin_insights(record["review"], record["rating"])
+        return {**record, "category": category, "summary": summary, "action": action}
+    return work
+
+def process_batch(pool, work, batch, dedup=True):
+    # Insights are generated for the first review of each near-duplicate
+    # cluster and copied to the rest
+    if not dedup or len(batch) < 2:
+        return list(pool.map(work, batch))
+    labels = cluster_texts([r["review"] for r in batch], threshold=REUSE_THRESHOLD).tolist()
+    heads = sorted(set(labels))
+    generated = dict(zip(heads, pool.map(work, [batch[i] for i in heads])))
+    return [
+        {**record, **{k: generated[head][k] for k in ("category", "summary", "action")}}
+        for record, head in zip(batch, labels)
+    ]
+
+def run(source, batch_size=200, concurrency=8, rate=10.0, checkpoint=CHECKPOINT_PATH, reset=False, limit=None,
+        dedup=True):
+    state = {} if reset else load_checkpoint(checkpoint)
+    key = "db" if source == "db" else os.path.abspath(source)
+    position = state.get(key, 0)
+
+    bucket = TokenBucket(rate, capacity=max(1, concurrency))
+    work = make_worker(bucket)
+
+    if source == "db":
+        batches = (
+            (batch[-1]["id"], batch)
+            for batch in iter_review_batches(after_id=position, batch_size=batch_size)
+        )
+        write = update_review_insights
+    else:
+        batches = iter_file_batches(source, position, batch_size)
+        write = save_reviews
+
+    done = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="backfill") as pool:
+        for next_position, batch in batches:
+            if limit is not None and done >= limit:
+                break
+            results = process_batch(pool, work, batch, dedup)
+            written = write(results)
+
+            state[key] = next_position
+            save_checkpoint(checkpoint, state)
+
+            done += len(results)
+            elapsed = time.perf_counter() - started
+            print(
+                f"✅ {done} reviews processed ({done / elapsed:.1f}/s), "
+                f"{written} written this batch, checkpoint={next_position}"
+            )
+
+    return done
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill or import admin insights in bulk.")
+    parser.add_argument("source", help='"db" to reprocess public.reviews, or a .csv/.jsonl file to import')
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=10.0, help="max LLM requests per second")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--reset", action="store_true", help="ignore any saved checkpoint")
+    parser.add_argument("--limit", type=int, default=None, help="stop after roughly N reviews")
+    parser.add_argument("--no-dedup", action="store_true", help="generate insights for every review")
+    args = parser.parse_args()
+
+    run(
+        args.source,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        checkpoint=args.checkpoint,
+        reset=args.reset,
+        limit=args.limit,
+        dedup=not args.no_dedup,
+    )
+
+if __name__ == "__main__":
+    main()
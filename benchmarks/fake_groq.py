@@ -0,0 +1,148 @@
+# benchmarks/fake_groq.py
+# Local stand-in for Groq's /openai/v1/chat/completions endpoint.
+#
+#   python benchmarks/fake_groq.py --port 8765 --latency 300 --jitter 100 --error-rate 0.02
+#
+# Then point the app at it with GROQ_URL=http://127.0.0.1:8765/openai/v1/chat/completions
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHAT_PATH = "/openai/v1/chat/completions"
+
+CANNED_INSIGHTS = json.dumps({
+    "category": "positive",
+    "summary": "Customer is happy with the product.",
+    "recommended_action": "Thank the customer and keep monitoring.",
+})
+CANNED_REPLY = "Thank you so much for your kind feedback, we really appreciate it!"
+
+def _completion_text(prompt: str) -> str:
+    # Prompts asking for JSON get JSON back so the parsers do real work
+    return CANNED_INSIGHTS if "JSON" in prompt else CANNED_REPLY
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        config = self.server.config
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self.path != CHAT_PATH:
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        with self.server.lock:
+            self.server.request_count += 1
+
+        delay = max(0.0, config["latency"] + random.uniform(-config["jitter"], config["jitter"]))
+        time.sleep(delay / 1000)
+
+        if random.random() < config["error_rate"]:
+            status = random.choice((429, 500, 503))
+            headers = {"Retry-After": "0"} if status == 429 else None
+            self._send_json(status, {"error": {"message": "injected failure"}}, headers)
+            return
+
+        prompt = payload.get("messages", [{}])[-1].get("content", "")
+        text = _completion_text(prompt)
+        usage = {
+            "prompt_tokens": max(1, len(prompt) // 4),
+            "completion_tokens": max(1, len(text) // 4),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if payload.get("stream"):
+            self._stream(payload, text, usage, config["chunk_delay"] / 1000)
+            return
+
+        self._send_json(200, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "model": payload.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    def _stream(self, payload, text, usage, chunk_delay):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(event: dict):
+            data = f"data: {json.dumps(event)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        for word in text.split(" "):
+            send({
+                "object": "chat.completion.chunk",
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "delta": {"content": word + " "}}],
+            })
+            time.sleep(chunk_delay)
+        send({
+            "object": "chat.completion.chunk",
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            "x_groq": {"usage": usage},
+        })
+        done = b"data: [DONE]\n\n"
+        self.wfile.write(f"{len(done):x}\r\n".encode() + done + b"\r\n0\r\n\r\n")
+        self.wfile.flush()
+
+def start_fake_groq(port=0, latency=300.0, jitter=50.0, error_rate=0.0, chunk_delay=20.0):
+    # Starts the server on a daemon thread; returns it (server.url is the chat endpoint)
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeGroqHandler)
+    server.daemon_threads = True
+    server.config = {
+        "latency": latency,
+        "jitter": jitter,
+        "error_rate": error_rate,
+        "chunk_delay": chunk_delay,
+    }
+    server.lock = threading.Lock()
+    server.request_count = 0
+    server.url = f"http://127.0.0.1:{server.server_address[1]}{CHAT_PATH}"
+    threading.Thread(target=server.serve_forever, name="fake-groq", daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Groq chat completions server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=300.0, help="mean latency in ms")
+    parser.add_argument("--jitter", type=float, default=50.0, help="± uniform jitter in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 429/5xx responses")
+    parser.add_argument("--chunk-delay", type=float, default=20.0, help="ms between stream chunks")
+    args = parser.parse_args()
+
+    server = start_fake_groq(args.port, args.latency, args.jitter, args.error_rate, args.chunk_delay)
+    print(f"Fake Groq listening on {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/import_budget.py
+# Import-time guard for the two Streamlit pages.
+#
+#   python benchmarks/import_budget.py                    # exit 1 on a regression
+#   python benchmarks/import_budget.py --budget-ms 200 --repeats 7
+#
+# Each page's own modules are imported in a fresh interpreter after streamlit
+# (which every page pays for regardless). The check fails when the median
+# import time exceeds the budget or when a heavy dependency that should load
+# lazily shows up at import time.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", "150"))
+
+PAGES = {
+    "user_app": {
+        "modules": ("ai_utils", "data_utils", "metrics_utils"),
+        "lazy": ("pandas", "numpy", "plotly", "sqlalchemy", "requests"),
+    },
+    "admin_app": {
+        "modules": ("data_utils", "export_reviews", "metrics_utils"),
+        "lazy": ("pandas", "numpy", "plotly", "sqlalchemy"),
+    },
+}
+
+_PROBE = """
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+try:
+    import streamlit  # noqa: F401  (baseline, not part of the budget)
+except ImportError:
+    pass
+before = set(sys.modules)
+started = time.perf_counter()
+for name in sys.argv[2:]:
+    __import__(name)
+elapsed = time.perf_counter() - started
+loaded = sorted({m.split(".")[0] for m in set(sys.modules) - before})
+print(json.dumps({"import_ms": elapsed * 1000, "loaded": loaded}))
+"""
+
+def probe(modules):
+    # No API key: importing must not need one
+    env = {k: v for k, v in os.environ.items() if k != "GROQ_API_KEY"}
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE, ROOT, *modules],
+        capture_output=True, text=True, env=env, cwd=ROOT, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def measure(repeats=5, budget_ms=IMPORT_BUDGET_MS):
+    results = {}
+    for page, spec in PAGES.items():
+        runs = [probe(spec["modules"]) for _ in range(repeats)]
+        median = statistics.median(r["import_ms"] for r in runs)
+        eager = sorted(set(spec["lazy"]) & set(runs[0]["loaded"]))
+        results[page] = {
+            "import_ms_median": round(median, 1),
+            "import_ms_max": round(max(r["import_ms"] for r in runs), 1),
+            "budget_ms": budget_ms,
+            "eager_heavy_modules": eager,
+            "ok": median <= budget_ms and not eager,
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if page imports regress.")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    results = measure(args.repeats, args.budget_ms)
+    print(json.dumps(results, indent=2))
+    for page, result in results.items():
+        if result["eager_heavy_modules"]:
+            print(f"❌ {page} imports {', '.join(result['eager_heavy_modules'])} eagerly", file=sys.stderr)
+        if result["import_ms_median"] > args.budget_ms:
+            print(f"❌ {page} imports in {result['import_ms_median']}ms (budget {args.budget_ms}ms)", file=sys.stderr)
+    sys.exit(0 if all(r["ok"] for r in results.values()) else 1)
+
+if __name__ == "__main__":
+    main()
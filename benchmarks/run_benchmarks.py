@@ -0,0 +1,219 @@
+# benchmarks/run_benchmarks.py
+# End-to-end benchmarks against a local fake Groq server and a SQLite store.
+#
+#   python benchmarks/run_benchmarks.py --output bench_results.json
+#   python benchmarks/run_benchmarks.py --sizes 1000,10000 --latency 150 --error-rate 0.05
+#
+# Results are written as JSON so runs can be compared over time.
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_groq import start_fake_groq  # noqa: E402
+from import_budget import measure as measure_imports  # noqa: E402
+
+WORDS = (
+    "great app love it slow crash login payment support fast easy confusing "
+    "update screen button help how why when price refund account broken nice"
+).split()
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(pick(50) * 1000, 3),
+        "p95_ms": round(pick(95) * 1000, 3),
+        "p99_ms": round(pick(99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+def random_review(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 40)))
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+# ==================== BENCHMARKS ====================
+
+def bench_call_llm(requests_total, concurrency):
+    import ai_utils
+
+    rng = random.Random(1)
+    prompts = [f"Reply briefly: {random_review(rng)} #{i}" for i in range(requests_total)]
+
+    def one(prompt):
+        started = time.perf_counter()
+        ok = bool(ai_utils.call_llm(prompt, ai_utils.USER_MODEL, max_tokens=40, use_cache=False))
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, prompts))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests_total,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests_total / elapsed, 2),
+        "failures": sum(1 for _, ok in results if not ok),
+        "latency": percentiles([t for t, _ in results]),
+    }
+
+def bench_submit_path(submissions, concurrency):
+    # Mirrors user_app: insights on the pool, reply streamed, then save_review
+    import ai_utils
+    import data_utils
+
+    rng = random.Random(2)
+    reviews = [(rng.randint(1, 5), random_review(rng)) for _ in range(submissions)]
+
+    def submit(item):
+        rating, review = item
+        started = time.perf_counter()
+        insights_future = ai_utils.submit_admin_insights(review, rating)
+        reply = "".join(ai_utils.stream_user_reply(review, rating)).strip()
+        reply_s = time.perf_counter() - started
+        category, summary, action = insights_future.result()
+        data_utils.save_review(rating, review, reply, summary, action, category)
+        return reply_s, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(submit, reviews))
+
+    return {
+        "submissions": submissions,
+        "concurrency": concurrency,
+        "reply_latency": percentiles([r for r, _ in results]),
+        "total_latency": percentiles([t for _, t in results]),
+    }
+
+def seed_reviews(store, target, batch=10000):
+    rng = random.Random(3)
+    current = store.data_version()[1]
+    while current < target:
+        n = min(batch, target - current)
+        store.save_many({
+            "rating": rng.randint(1, 5),
+            "category": rng.choice(("positive", "negative", "query")),
+            "review": random_review(rng),
+            "ai_response": "Thank you for your feedback.",
+            "summary": "Auto-generated benchmark review.",
+            "action": "None.",
+        } for _ in range(n))
+        current += n
+
+def bench_admin_render():
+    try:
+        from streamlit.testing.v1 import AppTest
+        import streamlit as st
+    except ImportError:
+        return {"skipped": "streamlit.testing is not available"}
+
+    st.cache_data.clear()
+    cold_s, app = timed(lambda: AppTest.from_file(os.path.join(ROOT, "admin_app.py"), default_timeout=120).run())
+    warm_s, _ = timed(app.run)
+    return {
+        "cold_ms": round(cold_s * 1000, 3),
+        "warm_ms": round(warm_s * 1000, 3),
+        "exceptions": [str(e.value) for e in app.exception],
+    }
+
+def bench_load_scaling(sizes, repeats):
+    import data_utils
+
+    store = data_utils.get_store()
+    results = []
+    for size in sizes:
+        seed_reviews(store, size)
+        load = [timed(data_utils.load_reviews)[0] for _ in range(repeats)]
+        stats = [timed(data_utils.load_review_stats)[0] for _ in range(repeats)]
+        page = [timed(data_utils.load_review_page, "review")[0] for _ in range(repeats)]
+        # First call hashes every new row; the rest only re-cluster
+        clusters = [timed(data_utils.load_review_clusters, limit=50)[0] for _ in range(repeats)]
+        results.append({
+            "rows": size,
+            "load_reviews": percentiles(load),
+            "load_review_stats": percentiles(stats),
+            "load_review_page": percentiles(page),
+            "load_review_clusters": percentiles(clusters),
+            "admin_render": bench_admin_render(),
+        })
+        print(f"  rows={size}: load_reviews p50={results[-1]['load_reviews']['p50_ms']}ms", file=sys.stderr)
+    return results
+
+# ==================== MAIN ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="Run end-to-end performance benchmarks.")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--latency", type=float, default=300.0, help="fake Groq mean latency (ms)")
+    parser.add_argument("--jitter", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--chunk-delay", type=float, default=20.0)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--submissions", type=int, default=100)
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--write-behind", action="store_true", help="benchmark save_review with write-behind on")
+    args = parser.parse_args()
+
+    server = start_fake_groq(0, args.latency, args.jitter, args.error_rate, args.chunk_delay)
+    workdir = tempfile.mkdtemp(prefix="review-bench-")
+
+    # Must be configured before the app modules are imported
+    os.environ.update({
+        "GROQ_API_KEY": "bench",
+        "GROQ_URL": server.url,
+        "GROQ_BACKOFF_BASE": "0.05",
+        "GROQ_RPM": "0",  # measure the app, not the quota limiter
+        "LLM_CACHE": "0",
+        "REVIEW_STORE": "sqlite",
+        "REVIEW_DB_PATH": os.path.join(workdir, "reviews.db"),
+        "REVIEW_JOURNAL_PATH": os.path.join(workdir, "review_journal.jsonl"),
+        "REVIEW_WRITE_BEHIND": "1" if args.write_behind else "0",
+    })
+
+    results = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+    }
+
+    print("import time...", file=sys.stderr)
+    results["import_time"] = measure_imports()
+    print("call_llm throughput...", file=sys.stderr)
+    results["call_llm"] = bench_call_llm(args.requests, args.concurrency)
+    print("submit path...", file=sys.stderr)
+    results["submit_path"] = bench_submit_path(args.submissions, args.concurrency)
+    print("load scaling...", file=sys.stderr)
+    results["load_scaling"] = bench_load_scaling(
+        [int(s) for s in args.sizes.split(",") if s.strip()], args.repeats
+    )
+    results["fake_groq_requests"] = server.request_count
+
+    server.shutdown()
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
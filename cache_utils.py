@@ -0,0 +1,109 @@
+# cache_utils.py
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ==================== CONFIG ====================
+
+CACHE_ENABLED = os.environ.get("LLM_CACHE", "1") == "1"
+CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "2048"))
+CACHE_TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL", "86400"))
+# Calls above this temperature are treated as non-deterministic and bypass the cache
+CACHE_MAX_TEMPERATURE = float(os.environ.get("LLM_CACHE_MAX_TEMPERATURE", "0.7"))
+# Optional persistent tier that survives Streamlit restarts (empty = memory only)
+CACHE_DB_PATH = os.environ.get("LLM_CACHE_DB", "")
+CACHE_DB_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_DB_MAX_ENTRIES", "50000"))
+# Expired rows are deleted and the row cap enforced on open and every N writes
+CACHE_PURGE_EVERY = 256
+
+_WHITESPACE = re.compile(r"\s+")
+
+# ==================== KEYS ====================
+
+def normalize_prompt(prompt: str) -> str:
+    return _WHITESPACE.sub(" ", prompt).strip().casefold()
+
+def make_cache_key(prompt: str, model: str, max_tokens: int, temperature: float) -> str:
+    raw = json.dumps(
+        [normalize_prompt(prompt), model, int(max_tokens), round(float(temperature), 3)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+# ==================== CACHE ====================
+
+class LLMCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, db_path=CACHE_DB_PATH,
+                 db_max_entries=CACHE_DB_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_max_entries = db_max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_cache (expires_at)")
+            self._purge_db()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._remember(key, row[0], row[1])
+                    return row[0]
+
+            return None
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at),
+                )
+                self._writes += 1
+                if self._writes % CACHE_PURGE_EVERY == 0:
+                    self._purge_db()
+
+    def _remember(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _purge_db(self):
+        # Every row has the same TTL, so the earliest expiry is also the
+        # oldest write: drop expired rows, then the oldest beyond the cap
+        self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+        self._db.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.db_max_entries,),
+        )
+
+llm_cache = LLMCache()
@@ -1,36 +1,367 @@
 # data_utils.py
-import pandas as pd
-import streamlit as st
-from sqlalchemy import text
-
-def get_connection():
-    return st.connection("supabase_db", type="sql")
-
-def save_review(rating: int, review: str, ai_response: str, summary: str, action: str):
-    conn = get_connection()
-    sql = text("""
-        INSERT INTO public.reviews (rating, review, ai_response, summary, recommended_action)
-        VALUES (:rating, :review, :ai_response, :summary, :action)
-    """)
-    with conn.session as session:
-        session.execute(sql, {
-            "rating": int(rating),
-            "review": review,
-            "ai_response": ai_response,
-            "summary": summary,
-            "action": action,
-        })
-        session.commit()
+# pandas, NumPy, SQLAlchemy and Streamlit's SQL connection are imported on the
+# paths that use them, so the user page can import this module cheaply.
+from __future__ import annotations
+
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING
+
+try:
+    import fcntl  # journal ownership between processes (POSIX only)
+except ImportError:
+    fcntl = None
+from metrics_utils import metrics
+from review_store import CATEGORIES, EXPORT_COLUMNS, PAGE_COLUMNS, TREND_BUCKETS, SchemaError, create_store
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Buffer submissions and flush them as multi-row inserts (0 = insert inline)
+WRITE_BEHIND = os.environ.get("REVIEW_WRITE_BEHIND", "1") == "1"
+WRITE_BATCH_SIZE = int(os.environ.get("REVIEW_WRITE_BATCH_SIZE", "50"))
+WRITE_FLUSH_INTERVAL = float(os.environ.get("REVIEW_WRITE_FLUSH_INTERVAL", "1.0"))
+WRITE_JOURNAL_PATH = os.environ.get("REVIEW_JOURNAL_PATH", "review_journal.jsonl")
+
+# ==================== STORAGE BACKEND ====================
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    # REVIEW_STORE=postgres (default, Supabase via st.connection) or sqlite
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store()
+    return _store
+
+def save_review(rating: int, review: str, ai_response: str, summary: str, action: str, category: str = None,
+                idempotency_key: str = None):
+    # A repeated idempotency_key is stored once, however often it is saved
+    row = {
+        "rating": int(rating),
+        "review": review,
+        "ai_response": ai_response,
+        "summary": summary,
+        "action": action,
+        "category": category,
+        "idempotency_key": idempotency_key,
+    }
+    with metrics.timer("db_seconds", op="save_review"):
+        if WRITE_BEHIND:
+            get_review_writer().submit(row)
+        else:
+            save_reviews([row])
 
 def load_reviews() -> pd.DataFrame:
-    conn = get_connection()
-    df = conn.query(
-        """
-        SELECT rating, review, ai_response, summary, recommended_action
-        FROM public.reviews
-        ORDER BY id DESC;
-        """,
-        ttl=0,  # always fresh (turn to 600 later)
-    )
-    df.columns = [c.lower() for c in df.columns]
-    return df
+    with metrics.timer("db_seconds", op="load_reviews"):
+        return get_store().load()
+
+# ==================== AGGREGATES ====================
+
+def load_rating_counts() -> dict:
+    # {rating: count}; a handful of rows no matter how big the table is
+    return get_store().rating_counts()
+
+def load_data_version() -> tuple:
+    # Cheap change token for cache keys: (max id, row count)
+    return get_store().data_version()
+
+def load_change_token():
+    # Cheapest possible "did anything change" probe; see ReviewStore.change_token
+    return get_store().change_token()
+
+def load_review_stats() -> dict:
+    counts = load_rating_counts()
+    total = sum(counts.values())
+    return {
+        "total": total,
+        "average": round(sum(r * n for r, n in counts.items()) / total, 2) if total else 0.0,
+        "positive": sum(n for r, n in counts.items() if r >= 4),
+        "negative": sum(n for r, n in counts.items() if r <= 2),
+        "rating_counts": counts,
+    }
+
+# ==================== PAGINATION ====================
+
+PAGE_SIZE = int(os.environ.get("REVIEW_PAGE_SIZE", "25"))
+
+def load_review_page(column: str, before=None, limit: int = PAGE_SIZE, category: str = None,
+                     rating: int = None) -> pd.DataFrame:
+    # Keyset page of (id, rating, category, created_at, <column>), newest
+    # first, optionally filtered by category and/or rating. Pass the last
+    # row's (created_at, id) of the previous page as before. One extra row is
+    # fetched so callers can tell whether a next page exists; it is never
+    # part of the page itself.
+    with metrics.timer("db_seconds", op="load_review_page"):
+        return get_store().page(
+            column, before=before, limit=int(limit) + 1, category=category, rating=rating
+        )
+
+# ==================== TRENDS ====================
+
+def load_review_trends(bucket: str = "day", days: int = 90, category: str = None) -> pd.DataFrame:
+    # Per-bucket review count and average rating by category over the last
+    # `days`, aggregated in SQL over the created_at index range
+    with metrics.timer("db_seconds", op="load_review_trends"):
+        return get_store().trends(bucket=bucket, days=days, category=category)
+
+# ==================== SEARCH ====================
+
+def search_reviews(query: str, page: int = 0, limit: int = PAGE_SIZE) -> pd.DataFrame:
+    # Ranked full-text hits; like load_review_page, one extra row signals a next page
+    with metrics.timer("db_seconds", op="search_reviews"):
+        return get_store().search(query, limit=int(limit) + 1, offset=int(page) * int(limit))
+
+# ==================== NEAR-DUPLICATE CLUSTERS ====================
+
+CLUSTER_BATCH_SIZE = int(os.environ.get("REVIEW_CLUSTER_BATCH_SIZE", "5000"))
+
+_cluster_index = None
+_cluster_lock = threading.Lock()
+
+def load_review_clusters(min_size: int = 1, limit: int = None) -> list:
+    # Shared across sessions: only reviews added since the last call are
+    # fetched and hashed, then the whole table is re-clustered in NumPy
+    global _cluster_index
+    with _cluster_lock, metrics.timer("db_seconds", op="load_review_clusters"):
+        if _cluster_index is None:
+            from similarity_utils import ReviewClusterIndex
+            _cluster_index = ReviewClusterIndex()
+        for batch in iter_review_batches(after_id=_cluster_index.max_id, batch_size=CLUSTER_BATCH_SIZE):
+            _cluster_index.extend(batch)
+        return _cluster_index.clusters(min_size=min_size, limit=limit)
+
+# ==================== BULK / BACKFILL ====================
+
+def save_reviews(rows):
+    # rows: iterable of dicts with rating, review, ai_response, summary, action
+    try:
+        with metrics.timer("db_seconds", op="save_reviews"):
+            saved = get_store().save_many(rows)
+    except Exception:
+        metrics.inc("db_errors_total", op="save_reviews")
+        raise
+    metrics.inc("db_rows_written_total", saved)
+    return saved
+
+def iter_review_batches(after_id: int = 0, batch_size: int = 500):
+    # Keyset scan over the table so memory stays bounded
+    return get_store().iter_batches(after_id=after_id, batch_size=batch_size)
+
+def update_review_insights(rows):
+    # rows: iterable of dicts with id, category, summary, action
+    return get_store().update_insights(rows)
+
+def iter_review_export(columns=EXPORT_COLUMNS, chunk_size: int = 5000, category: str = None,
+                       rating: int = None, since=None, until=None):
+    # Row-tuple chunks in id order for exports; since/until are dates
+    # (until is exclusive). Nothing beyond one chunk is held in memory.
+    since = since.isoformat() if hasattr(since, "isoformat") else since
+    until = until.isoformat() if hasattr(until, "isoformat") else until
+    for chunk in get_store().stream(
+        columns, chunk_size=chunk_size, category=category, rating=rating, since=since, until=until
+    ):
+        metrics.inc("db_rows_exported_total", len(chunk))
+        yield chunk
+
+# ==================== WARM-UP ====================
+
+# Connect to the database (and whatever else the page passes in) on a
+# background thread when the server process starts, so the first visitor
+# does not pay for it
+APP_WARM_UP = os.environ.get("APP_WARM_UP", "1") == "1"
+
+_warm_up_started = False
+_warm_up_lock = threading.Lock()
+
+def warm_up_store():
+    try:
+        get_store().data_version()
+    except SchemaError as e:
+        print("❌ DB SCHEMA OUT OF DATE:", e)
+    except Exception as e:
+        print("⚠️ DB WARM-UP FAILED:", e)
+
+def start_warm_up(*tasks):
+    # Idempotent; safe to call on every Streamlit rerun
+    global _warm_up_started
+    if not APP_WARM_UP:
+        return
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+
+    def run():
+        for task in tasks:
+            task()
+    threading.Thread(target=run, name="warm-up", daemon=True).start()
+
+# ==================== WRITE-BEHIND ====================
+
+class ReviewWriter:
+    # Queues reviews in memory and flushes them in batches on a background
+    # thread. Every row is appended to a local journal before it is queued,
+    # and the journal is only trimmed after the batch commits, so rows
+    # survive a crash and are replayed on the next start (at-least-once;
+    # rows with an idempotency key are still inserted only once).
+    #
+    # Each process keeps its own journal (<path>.<pid>) under an exclusive
+    # flock, so replicas sharing a directory never trim each other's rows.
+    # On start, journals whose owner has died (lock free) are adopted.
+
+    def __init__(self, journal_path=WRITE_JOURNAL_PATH, batch_size=WRITE_BATCH_SIZE,
+                 flush_interval=WRITE_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._cond = threading.Condition()
+        self._closed = False
+        if fcntl is None:
+            # No flock: a single shared journal, safe for one process only
+            self._journal = open(journal_path, "a+", encoding="utf-8")
+        else:
+            self._journal = open(f"{journal_path}.{os.getpid()}", "a+", encoding="utf-8")
+            fcntl.flock(self._journal.fileno(), fcntl.LOCK_EX)
+        self._replay()
+        if fcntl is not None:
+            self._adopt_orphans(journal_path)
+        self._thread = threading.Thread(target=self._run, name="review-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _replay(self):
+        self._journal.seek(0)
+        for line in self._journal:
+            try:
+                self._pending.append(json.loads(line))
+            except ValueError:
+                pass  # torn final line from a crash mid-write
+        if self._pending:
+            print(f"♻️ Replaying {len(self._pending)} journaled reviews")
+
+    def _adopt_orphans(self, journal_path):
+        # Moves rows from journals no live process holds into ours, then
+        # deletes them; copied and fsynced first so a crash here loses nothing
+        own = os.path.abspath(self._journal.name)
+        for path in [journal_path] + glob.glob(f"{glob.escape(journal_path)}.*"):
+            if os.path.abspath(path) == own or not os.path.isfile(path):
+                continue
+            with open(path, "r", encoding="utf-8") as orphan:
+                try:
+                    fcntl.flock(orphan.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue  # owner is alive
+                if os.fstat(orphan.fileno()).st_nlink == 0:
+                    continue  # already adopted by another process
+                rows = []
+                for line in orphan:
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        pass  # torn final line from a crash mid-write
+                for row in rows:
+                    self._journal.write(json.dumps(row, ensure_ascii=False) + "\n")
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                self._pending.extend(rows)
+                os.remove(path)
+            if rows:
+                print(f"♻️ Adopted {len(rows)} journaled reviews from {path}")
+
+    def submit(self, row: dict):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("ReviewWriter is closed")
+            self._journal.write(json.dumps(row, ensure_ascii=False) + "\n")
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._pending.append(row)
+            metrics.set_gauge("review_writer_pending", len(self._pending))
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def _rewrite_journal(self):
+        # Caller holds the lock; keeps only rows that are still pending
+        self._journal.seek(0)
+        self._journal.truncate()
+        for row in self._pending:
+            self._journal.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def flush(self) -> int:
+        with self._cond:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        try:
+            save_reviews(batch)
+        except Exception as e:
+            print("❌ REVIEW FLUSH ERROR:", e)
+            with self._cond:
+                self._pending = batch + self._pending
+            if isinstance(e, SchemaError):
+                raise  # rows stay journaled until the migration is applied
+            return 0
+        with self._cond:
+            self._rewrite_journal()
+            metrics.set_gauge("review_writer_pending", len(self._pending))
+        return len(batch)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closed or len(self._pending) >= self.batch_size,
+                    timeout=self.flush_interval,
+                )
+                closed = self._closed
+            try:
+                self.flush()
+            except SchemaError:
+                # Retrying can't succeed; new rows keep going to the journal
+                # and are replayed on the next start
+                print("❌ REVIEW WRITER STOPPED: apply the missing migration and restart")
+                return
+            if closed:
+                return
+            if self.pending_count() >= self.batch_size:
+                time.sleep(self.flush_interval)  # flush failed; don't spin on a dead DB
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=30)
+        with self._cond:
+            empty = not self._pending
+        if empty and fcntl is not None:
+            # Nothing left to replay; don't leave a file per past pid behind
+            os.remove(self._journal.name)
+        self._journal.close()
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_review_writer() -> ReviewWriter:
+    # One writer per process; replays the journal the first time it is created
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ReviewWriter()
+    return _writer
@@ -0,0 +1,147 @@
+# export_reviews.py
+# Stream reviews out of the database into CSV, JSONL or Parquet.
+#
+#   python export_reviews.py reviews.csv                         # same layout as the sample reviews.csv
+#   python export_reviews.py negatives.jsonl --category negative --since 2025-01-01
+#   python export_reviews.py reviews.parquet --rating 1 --with-meta
+#
+# Rows are read through a server-side cursor and written chunk by chunk, so
+# memory stays flat whatever the table size. Parquet needs pyarrow.
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from datetime import date
+
+from data_utils import CATEGORIES, EXPORT_COLUMNS, iter_review_export
+
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+EXPORT_CHUNK_SIZE = int(os.environ.get("REVIEW_EXPORT_CHUNK_SIZE", "5000"))
+META_COLUMNS = ("id", "created_at")
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def format_for_path(path: str) -> str:
+    fmt = os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {path} (use .csv, .jsonl or .parquet)")
+    return fmt
+
+# ==================== WRITERS ====================
+
+def _write_csv(out, columns, chunks):
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+    try:
+        writer = csv.writer(text)
+        writer.writerow(columns)
+        for chunk in chunks:
+            writer.writerows(chunk)
+    finally:
+        text.detach()  # leave the caller's file open
+
+def _write_jsonl(out, columns, chunks):
+    for chunk in chunks:
+        out.write("".join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) + "\n"
+            for row in chunk
+        ).encode("utf-8"))
+
+def _write_parquet(out, columns, chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # created_at is text on SQLite and a timestamp on Postgres, so it is
+    # exported as a string either way
+    schema = pa.schema([
+        (c, pa.int64() if c in ("id", "rating") else pa.string()) for c in columns
+    ])
+    with pq.ParquetWriter(out, schema) as writer:
+        for chunk in chunks:
+            # One row group per chunk
+            arrays = []
+            for field, values in zip(schema, zip(*chunk)):
+                if field.type == pa.string():
+                    values = [None if v is None else str(v) for v in values]
+                arrays.append(pa.array(values, type=field.type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl, "parquet": _write_parquet}
+
+# ==================== EXPORT ====================
+
+def export_reviews(out, fmt="csv", category=None, rating=None, since=None, until=None,
+                   with_meta=False, chunk_size=EXPORT_CHUNK_SIZE, limit=None) -> int:
+    # Writes to a binary file object; returns the number of rows exported
+    # (at most limit, when given)
+    columns = (META_COLUMNS + EXPORT_COLUMNS) if with_meta else EXPORT_COLUMNS
+    exported = 0
+
+    def chunks():
+        nonlocal exported
+        source = iter_review_export(
+            columns, chunk_size=chunk_size, category=category, rating=rating, since=since, until=until
+        )
+        try:
+            for chunk in source:
+                if limit is not None:
+                    chunk = chunk[:limit - exported]
+                exported += len(chunk)
+                if chunk:
+                    yield chunk
+                if limit is not None and exported >= limit:
+                    return
+        finally:
+            source.close()  # releases the server-side cursor when stopping early
+
+    WRITERS[fmt](out, columns, chunks())
+    return exported
+
+def export_to_path(path, fmt=None, **filters) -> int:
+    fmt = fmt or format_for_path(path)
+    tmp = f"{path}.tmp"
+    try:
+        with open(tmp, "wb") as out:
+            exported = export_reviews(out, fmt, **filters)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    os.replace(tmp, path)  # never leaves a truncated export behind
+    return exported
+
+def main():
+    parser = argparse.ArgumentParser(description="Export reviews to CSV, JSONL or Parquet.")
+    parser.add_argument("output", help="destination file (.csv, .jsonl or .parquet)")
+    parser.add_argument("--category", choices=CATEGORIES)
+    parser.add_argument("--rating", type=int, choices=range(1, 6))
+    parser.add_argument("--since", type=date.fromisoformat, help="first day to include (YYYY-MM-DD)")
+    parser.add_argument("--until", type=date.fromisoformat, help="first day to exclude (YYYY-MM-DD)")
+    parser.add_argument("--with-meta", action="store_true", help="prepend id and created_at columns")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    fmt = format_for_path(args.output)
+    if fmt == "parquet" and not parquet_available():
+        parser.error("Parquet export needs pyarrow (pip install pyarrow)")
+
+    started = time.perf_counter()
+    exported = export_to_path(
+        args.output,
+        fmt,
+        category=args.category,
+        rating=args.rating,
+        since=args.since,
+        until=args.until,
+        with_meta=args.with_meta,
+        chunk_size=args.chunk_size,
+    )
+    print(f"✅ {exported} reviews exported to {args.output} in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
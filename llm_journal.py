@@ -0,0 +1,212 @@
+# llm_journal.py
+# Record/replay for LLM calls.
+#
+#   LLM_JOURNAL_MODE=record  append every request, response, latency and usage to the journal
+#   LLM_JOURNAL_MODE=replay  answer from the journal by prompt hash, never touching the network
+#
+#   python llm_journal.py summarize [llm_journal.jsonl]   # latency/token profile per model
+#
+# Recording is buffered in memory and written by a background thread, so the
+# request path only pays for a list append.
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+from metrics_utils import metrics
+
+LLM_JOURNAL_MODE = os.environ.get("LLM_JOURNAL_MODE", "off").strip().lower()
+LLM_JOURNAL_PATH = os.environ.get("LLM_JOURNAL_PATH", "llm_journal.jsonl")
+JOURNAL_FLUSH_INTERVAL = float(os.environ.get("LLM_JOURNAL_FLUSH_INTERVAL", "1.0"))
+# Records beyond this are dropped (and counted) rather than grow memory
+JOURNAL_MAX_PENDING = int(os.environ.get("LLM_JOURNAL_MAX_PENDING", "10000"))
+# Replay sleeps recorded latency * scale (0 = answer instantly)
+REPLAY_LATENCY_SCALE = float(os.environ.get("LLM_REPLAY_LATENCY_SCALE", "0"))
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.strip().encode("utf-8")).hexdigest()
+
+# ==================== RECORD ====================
+
+class JournalRecorder:
+    def __init__(self, path=LLM_JOURNAL_PATH, flush_interval=JOURNAL_FLUSH_INTERVAL,
+                 max_pending=JOURNAL_MAX_PENDING):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._file = open(path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="llm-journal", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, payload, content, usage, latency, outcome, stream=False):
+        entry = {
+            "ts": time.time(),
+            "prompt_hash": prompt_hash(payload["messages"][-1]["content"]),
+            "model": payload.get("model"),
+            "stream": stream,
+            "request": payload,
+            "content": content,
+            "usage": usage or {},
+            "latency_s": round(latency, 6),
+            "outcome": outcome,
+        }
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                metrics.inc("llm_journal_dropped_total")
+                return
+            self._pending.append(entry)
+
+    def flush(self) -> int:
+        with self._cond:
+            batch, self._pending = self._pending, []
+        if batch:
+            # Serialized here, off the request threads
+            self._file.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in batch))
+            self._file.flush()
+            metrics.inc("llm_journal_records_total", len(batch))
+        return len(batch)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            try:
+                self.flush()
+            except OSError as e:
+                print("❌ LLM JOURNAL WRITE ERROR:", e)
+            if closed:
+                return
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=10)
+        self._file.close()
+
+# ==================== REPLAY ====================
+
+class JournalReplayer:
+    # Successful responses grouped by prompt hash. A prompt recorded several
+    # times is answered with each recording in turn, so runs stay deterministic
+    # while keeping the recorded variety.
+    def __init__(self, path=LLM_JOURNAL_PATH, latency_scale=REPLAY_LATENCY_SCALE):
+        self.latency_scale = latency_scale
+        self._entries = defaultdict(list)
+        self._cursor = defaultdict(int)
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            for entry in iter_journal(path):
+                if entry.get("content"):
+                    self._entries[entry["prompt_hash"]].append(
+                        (entry["content"], entry.get("usage") or {}, entry.get("latency_s", 0.0))
+                    )
+        else:
+            print(f"⚠️ LLM JOURNAL NOT FOUND, replay will miss: {path}")
+
+    def replay(self, payload):
+        # (content, usage); ("", {}) when the prompt was never recorded
+        key = prompt_hash(payload["messages"][-1]["content"])
+        with self._lock:
+            recorded = self._entries.get(key)
+            if not recorded:
+                metrics.inc("llm_replay_total", result="miss")
+                return "", {}
+            content, usage, latency = recorded[self._cursor[key] % len(recorded)]
+            self._cursor[key] += 1
+        metrics.inc("llm_replay_total", result="hit")
+        if self.latency_scale > 0:
+            time.sleep(latency * self.latency_scale)
+        return content, usage
+
+    def __len__(self):
+        return sum(len(v) for v in self._entries.values())
+
+# ==================== MODE ====================
+
+recorder = None
+replayer = None
+_mode_lock = threading.Lock()
+
+def get_recorder():
+    # None unless LLM_JOURNAL_MODE=record
+    global recorder
+    if LLM_JOURNAL_MODE != "record":
+        return None
+    if recorder is None:
+        with _mode_lock:
+            if recorder is None:
+                recorder = JournalRecorder()
+    return recorder
+
+def get_replayer():
+    # None unless LLM_JOURNAL_MODE=replay
+    global replayer
+    if LLM_JOURNAL_MODE != "replay":
+        return None
+    if replayer is None:
+        with _mode_lock:
+            if replayer is None:
+                replayer = JournalReplayer()
+    return replayer
+
+# ==================== ANALYSIS ====================
+
+def iter_journal(path=LLM_JOURNAL_PATH):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue  # torn last line from a crash mid-write
+
+def summarize(path=LLM_JOURNAL_PATH) -> list:
+    # One row per (model, stream): count, error rate, latency percentiles, tokens
+    groups = defaultdict(list)
+    for entry in iter_journal(path):
+        groups[(entry.get("model"), bool(entry.get("stream")))].append(entry)
+
+    def pct(ordered, p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    rows = []
+    for (model, stream), entries in sorted(groups.items(), key=lambda kv: str(kv[0])):
+        latencies = sorted(e.get("latency_s", 0.0) for e in entries)
+        usage = [e.get("usage") or {} for e in entries]
+        rows.append({
+            "model": model,
+            "mode": "stream" if stream else "blocking",
+            "requests": len(entries),
+            "error_rate": round(sum(1 for e in entries if e.get("outcome") != "ok") / len(entries), 4),
+            "p50_ms": round(pct(latencies, 50) * 1000, 1),
+            "p95_ms": round(pct(latencies, 95) * 1000, 1),
+            "p99_ms": round(pct(latencies, 99) * 1000, 1),
+            "avg_prompt_tokens": round(statistics.fmean(u.get("prompt_tokens", 0) for u in usage), 1),
+            "avg_completion_tokens": round(statistics.fmean(u.get("completion_tokens", 0) for u in usage), 1),
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect an LLM record/replay journal.")
+    parser.add_argument("command", choices=["summarize"])
+    parser.add_argument("path", nargs="?", default=LLM_JOURNAL_PATH)
+    args = parser.parse_args()
+    print(json.dumps(summarize(args.path), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# metrics_utils.py
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==================== CONFIG ====================
+
+# Each process periodically writes <dir>/<pid>.prom and <pid>.json; the admin
+# Operations panel merges every snapshot it finds there.
+METRICS_DIR = os.environ.get("METRICS_DIR", "")
+METRICS_EXPORT_INTERVAL = float(os.environ.get("METRICS_EXPORT_INTERVAL", "10"))
+# Snapshots not refreshed for this many intervals belong to a dead process
+METRICS_STALE_INTERVALS = 3
+# Optional Prometheus scrape endpoint (http://host:<port>/metrics)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _label_text(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    inner = ",".join(f'{k}="{v}"' for k, v in pairs)
+    return "{" + inner + "}"
+
+# ==================== REGISTRY ====================
+
+class MetricsRegistry:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}    # name -> {label_key: value}
+        self._gauges = {}      # name -> {label_key: value}
+        self._histograms = {}  # name -> {label_key: [bucket counts..., +Inf, sum, count]}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = [0] * (len(self.buckets) + 3)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist[i] += 1
+                    break
+            else:
+                hist[len(self.buckets)] += 1
+            hist[-2] += value
+            hist[-1] += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> dict:
+        # JSON-friendly copy: {"counters": {name: [[labels, value], ...]}, ...}
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "time": time.time(),
+                "buckets": list(self.buckets),
+                "counters": {n: [[dict(k), v] for k, v in s.items()] for n, s in self._counters.items()},
+                "gauges": {n: [[dict(k), v] for k, v in s.items()] for n, s in self._gauges.items()},
+                "histograms": {n: [[dict(k), list(h)] for k, h in s.items()] for n, s in self._histograms.items()},
+            }
+
+metrics = MetricsRegistry()
+
+# ==================== RENDERING ====================
+
+def render_prometheus(snapshot: dict = None) -> str:
+    snapshot = snapshot or metrics.snapshot()
+    buckets = snapshot["buckets"]
+    lines = []
+    for name, series in sorted(snapshot["counters"].items()):
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in series:
+            lines.append(f"{name}{_label_text(_label_key(labels))} {value}")
+    for name, series in sorted(snapshot["gauges"].items()):
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in series:
+            lines.append(f"{name}{_label_text(_label_key(labels))} {value}")
+    for name, series in sorted(snapshot["histograms"].items()):
+        lines.append(f"# TYPE {name} histogram")
+        for labels, hist in series:
+            key = _label_key(labels)
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ["+Inf"], hist[:-2]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_label_text(key, (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_label_text(key)} {hist[-2]}")
+            lines.append(f"{name}_count{_label_text(key)} {hist[-1]}")
+    return "\n".join(lines) + "\n"
+
+def histogram_quantile(q: float, buckets, hist) -> float:
+    # Linear interpolation inside the bucket, same approach as PromQL
+    total = hist[-1]
+    if not total:
+        return 0.0
+    rank = q * total
+    cumulative = 0
+    lower = 0.0
+    for bound, count in zip(buckets, hist):
+        if cumulative + count >= rank:
+            return lower + (bound - lower) * ((rank - cumulative) / count if count else 0)
+        cumulative += count
+        lower = bound
+    return float(buckets[-1])
+
+def merge_snapshots(snapshots) -> dict:
+    # Sums counters/histograms across processes; gauges are summed too
+    merged = {"buckets": list(LATENCY_BUCKETS), "counters": {}, "gauges": {}, "histograms": {}}
+    for snap in snapshots:
+        for kind in ("counters", "gauges"):
+            for name, series in snap.get(kind, {}).items():
+                target = merged[kind].setdefault(name, {})
+                for labels, value in series:
+                    key = _label_key(labels)
+                    target[key] = target.get(key, 0) + value
+        for name, series in snap.get("histograms", {}).items():
+            target = merged["histograms"].setdefault(name, {})
+            for labels, hist in series:
+                key = _label_key(labels)
+                if key in target:
+                    target[key] = [a + b for a, b in zip(target[key], hist)]
+                else:
+                    target[key] = list(hist)
+    for kind in ("counters", "gauges", "histograms"):
+        merged[kind] = {n: [[dict(k), v] for k, v in s.items()] for n, s in merged[kind].items()}
+    return merged
+
+def collect_snapshots() -> list:
+    # This process plus any snapshots other processes exported to METRICS_DIR
+    snapshots = [metrics.snapshot()]
+    if METRICS_DIR:
+        stale_before = time.time() - METRICS_STALE_INTERVALS * METRICS_EXPORT_INTERVAL
+        for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+            if os.path.basename(path) == f"{os.getpid()}.json":
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue  # file being replaced or from a dead process mid-write
+            if snapshot.get("time", 0) >= stale_before:
+                snapshots.append(snapshot)
+    return snapshots
+
+# ==================== EXPORTERS ====================
+
+def _write_atomic(path: str, content: str):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+def export_metrics(directory: str = METRICS_DIR):
+    snapshot = metrics.snapshot()
+    os.makedirs(directory, exist_ok=True)
+    _write_atomic(os.path.join(directory, f"{os.getpid()}.json"), json.dumps(snapshot))
+    _write_atomic(os.path.join(directory, f"{os.getpid()}.prom"), render_prometheus(snapshot))
+
+def remove_exported_metrics(directory: str = METRICS_DIR):
+    # Clean shutdown: drop this process's files so nothing reads them again
+    for suffix in ("json", "prom"):
+        try:
+            os.remove(os.path.join(directory, f"{os.getpid()}.{suffix}"))
+        except OSError:
+            pass
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = render_prometheus(merge_snapshots(collect_snapshots())).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+def start_metrics_exporter():
+    # Idempotent; safe to call on every Streamlit rerun
+    global _exporter_started
+    with _exporter_lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+
+    if METRICS_DIR:
+        def loop():
+            while True:
+                try:
+                    export_metrics()
+                except OSError as e:
+                    print("❌ METRICS EXPORT ERROR:", e)
+                time.sleep(METRICS_EXPORT_INTERVAL)
+        threading.Thread(target=loop, name="metrics-export", daemon=True).start()
+        atexit.register(remove_exported_metrics)
+
+    if METRICS_PORT:
+        try:
+            server = ThreadingHTTPServer(("0.0.0.0", METRICS_PORT), _MetricsHandler)
+        except OSError as e:
+            # Another app process on this host already serves the port
+            print("⚠️ METRICS PORT UNAVAILABLE:", e)
+            return
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
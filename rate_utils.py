@@ -0,0 +1,132 @@
+# rate_utils.py
+import threading
+import time
+from collections import deque
+
+# ==================== TOKEN BUCKET ====================
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        # rate = tokens added per second, capacity = max burst
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1, timeout: float = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+# ==================== SINGLE-FLIGHT ====================
+
+class _Flight:
+    __slots__ = ("done", "result")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+class SingleFlight:
+    # Concurrent callers with the same key share one execution: the first
+    # becomes the leader, the rest wait for its result
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key):
+        # (leader, flight); a leader must call finish() exactly once
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return False, flight
+            flight = self._flights[key] = _Flight()
+            return True, flight
+
+    def finish(self, key, flight, result):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.result = result
+        flight.done.set()
+
+    def wait(self, flight, timeout: float = None):
+        # The leader's result, or None if it did not finish in time
+        return flight.result if flight.done.wait(timeout) else None
+
+# ==================== ADMISSION QUEUE ====================
+
+class QueueFull(Exception):
+    pass
+
+class AdmissionQueue:
+    # At most max_active holders at once; the next max_waiting callers wait
+    # in FIFO order and can ask for their position, anyone beyond that is
+    # turned away with QueueFull
+    def __init__(self, max_active: int, max_waiting: int):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self._admitted = set()
+        self._waiting = deque()
+        self._next_ticket = 0
+        self._cond = threading.Condition()
+
+    def _promote(self):
+        while self._waiting and len(self._admitted) < self.max_active:
+            self._admitted.add(self._waiting.popleft())
+        self._cond.notify_all()
+
+    def join(self) -> int:
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            if not self._waiting and len(self._admitted) < self.max_active:
+                self._admitted.add(ticket)
+            elif len(self._waiting) < self.max_waiting:
+                self._waiting.append(ticket)
+            else:
+                raise QueueFull(f"{len(self._waiting)} already waiting")
+            return ticket
+
+    def position(self, ticket: int) -> int:
+        # 0 once admitted, otherwise 1-based place in line
+        with self._cond:
+            if ticket in self._admitted:
+                return 0
+            try:
+                return self._waiting.index(ticket) + 1
+            except ValueError:
+                return 0
+
+    def wait(self, ticket: int, timeout: float = None) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: ticket in self._admitted, timeout)
+
+    def leave(self, ticket: int):
+        # Frees the slot (or the place in line, if never admitted)
+        with self._cond:
+            if ticket in self._admitted:
+                self._admitted.discard(ticket)
+            else:
+                try:
+                    self._waiting.remove(ticket)
+                except ValueError:
+                    return
+            self._promote()
@@ -0,0 +1,772 @@
+# review_store.py
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd  # imported where frames are built, to keep imports cheap
+
+REVIEW_COLUMNS = (
+    "id", "rating", "review", "ai_response", "summary", "recommended_action", "category", "created_at"
+)
+PAGE_COLUMNS = ("review", "ai_response", "summary", "recommended_action")
+# Same layout as reviews.csv; export_reviews.py can prepend id/created_at
+EXPORT_COLUMNS = ("rating", "review", "ai_response", "summary", "recommended_action", "category")
+CATEGORIES = ("positive", "negative", "query")
+TREND_BUCKETS = ("day", "week")
+
+# Columns the app reads and writes, and the migration that adds each one
+REQUIRED_MIGRATIONS = {
+    "created_at": "sql/002_reviews_indexes.sql",
+    "category": "sql/004_reviews_category.sql",
+    "idempotency_key": "sql/006_reviews_idempotency.sql",
+}
+
+class SchemaError(RuntimeError):
+    # The database is missing a migration; retrying will not help
+    pass
+
+def _check_column(column: str):
+    # Column names are interpolated into SQL, so only known ones get through
+    if column not in PAGE_COLUMNS:
+        raise ValueError(f"Unknown review column: {column}")
+
+_SEARCH_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+def fts5_query(text: str) -> str:
+    # User text -> safe FTS5 MATCH expression: every word must appear, and the
+    # last word also matches as a prefix (search-as-you-type)
+    tokens = _SEARCH_TOKEN.findall(text)
+    if not tokens:
+        return ""
+    terms = [f'"{t}"' for t in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+def _normalize_rows(rows):
+    return [
+        {
+            "rating": int(r["rating"]),
+            "review": r["review"],
+            "ai_response": r.get("ai_response", ""),
+            "summary": r.get("summary", ""),
+            "action": r.get("action", ""),
+            "category": r.get("category"),
+            "idempotency_key": r.get("idempotency_key"),
+        }
+        for r in rows
+    ]
+
+def _facet_filters(category=None, rating=None, since=None, before=None, until=None):
+    # Shared WHERE clauses (named :params work in both sqlite3 and SQLAlchemy).
+    # before is a (created_at, id) keyset cursor; every filter combination is
+    # served by the (category|rating, created_at) indexes or created_at alone.
+    clauses, params = [], {}
+    if category:
+        clauses.append("category = :category")
+        params["category"] = category
+    if rating:
+        clauses.append("rating = :rating")
+        params["rating"] = int(rating)
+    if since is not None:
+        clauses.append("created_at >= :since")
+        params["since"] = since
+    if until is not None:
+        clauses.append("created_at < :until")
+        params["until"] = until
+    if before is not None:
+        clauses.append("(created_at, id) < (:before_at, :before_id)")
+        params["before_at"], params["before_id"] = before
+    return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+# ==================== INTERFACE ====================
+
+class ReviewStore:
+    # Every backend returns lower-case column names and orders reviews newest first.
+
+    name = "base"
+
+    def save_many(self, rows) -> int:
+        # rows: dicts with rating, review, ai_response, summary, action and an
+        # optional idempotency_key; a row whose key is already stored is skipped
+        raise NotImplementedError
+
+    def load(self, after_id: int = None) -> pd.DataFrame:
+        # All REVIEW_COLUMNS, optionally only rows with id > after_id
+        raise NotImplementedError
+
+    def rating_counts(self) -> dict:
+        raise NotImplementedError
+
+    def data_version(self) -> tuple:
+        # Cheap (max id, count) change token
+        raise NotImplementedError
+
+    def change_token(self):
+        # Opaque value that changes whenever reviews are inserted, updated or
+        # deleted; only ever compared for equality. Cheaper than data_version
+        # where the backend allows it.
+        return self.data_version()
+
+    def page(self, column: str, before=None, limit: int = 25, category=None, rating=None) -> pd.DataFrame:
+        # Keyset page of (id, rating, category, created_at, <column>), newest
+        # first, optionally faceted; before is the last row's (created_at, id)
+        raise NotImplementedError
+
+    def trends(self, bucket: str = "day", days: int = 90, category=None) -> pd.DataFrame:
+        # bucket, category, reviews, avg_rating per time bucket over the last
+        # `days`, oldest first
+        raise NotImplementedError
+
+    def iter_batches(self, after_id: int = 0, batch_size: int = 500):
+        # Oldest-first batches of {id, rating, review} dicts
+        raise NotImplementedError
+
+    def update_insights(self, rows) -> int:
+        # rows: dicts with id, category, summary, action
+        raise NotImplementedError
+
+    def search(self, query: str, limit: int = 25, offset: int = 0) -> pd.DataFrame:
+        # Ranked full-text hits over review, summary and recommended_action:
+        # id, rating, review, summary, recommended_action, best match first
+        raise NotImplementedError
+
+    def stream(self, columns=EXPORT_COLUMNS, chunk_size=5000, category=None, rating=None,
+               since=None, until=None):
+        # Lists of row tuples in id order from one server-side cursor; memory
+        # is bounded by chunk_size however many rows match
+        raise NotImplementedError
+
+# ==================== POSTGRES (SUPABASE) ====================
+
+# Live dashboard probe: LISTEN for the statement-level NOTIFY installed by
+# sql/005_reviews_notify.sql instead of querying on every tick
+REVIEW_LISTEN = os.environ.get("REVIEW_LISTEN", "1") == "1"
+NOTIFY_CHANNEL = "reviews_changed"
+LISTEN_RETRY_SECONDS = 30
+
+class PostgresStore(ReviewStore):
+    name = "postgres"
+
+    def __init__(self, connection_name="supabase_db", use_stats_table=False):
+        self.connection_name = connection_name
+        # Read counts from the trigger-maintained table in sql/001_review_rating_counts.sql
+        self.use_stats_table = use_stats_table
+        self._connection = None
+        self._connection_lock = threading.Lock()
+        self._listener = None
+        self._listener_ready = threading.Event()
+        self._listening = False
+        self._generation = 0
+
+    def _conn(self):
+        # The SQLAlchemy engine behind it is created once and reused; it is
+        # only kept once the schema check passes, so a missing migration
+        # fails every call with the same clear error
+        if self._connection is None:
+            with self._connection_lock:
+                if self._connection is None:
+                    import streamlit as st
+                    connection = st.connection(self.connection_name, type="sql")
+                    self._check_schema(connection)
+                    self._connection = connection
+        return self._connection
+
+    def _check_schema(self, connection):
+        df = connection.query(
+            """
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = 'reviews'
+            """,
+            ttl=0,
+        )
+        columns = {str(c).lower() for c in df.iloc[:, 0]} if len(df) else set()
+        if not columns:
+            raise SchemaError("public.reviews does not exist")
+        missing = [c for c in REQUIRED_MIGRATIONS if c not in columns]
+        if missing:
+            migrations = ", ".join(sorted({REQUIRED_MIGRATIONS[c] for c in missing}))
+            raise SchemaError(
+                f"public.reviews is missing {', '.join(missing)}: apply {migrations} and restart"
+            )
+
+    def _query(self, sql, params=None) -> pd.DataFrame:
+        df = self._conn().query(sql, params=params, ttl=0)
+        df.columns = [c.lower() for c in df.columns]
+        return df
+
+    def _execute(self, sql, params) -> int:
+        # Returns the affected row count, or -1 where the driver can't tell
+        from sqlalchemy import text
+        with self._conn().session as session:
+            result = session.execute(text(sql), params)  # a list of dicts runs as executemany
+            session.commit()
+        return result.rowcount
+
+    def save_many(self, rows) -> int:
+        rows = _normalize_rows(rows)
+        if not rows:
+            return 0
+        # Rows skipped as duplicates are not counted
+        inserted = self._execute(
+            """
+            INSERT INTO public.reviews
+                (rating, review, ai_response, summary, recommended_action, category, idempotency_key)
+            VALUES (:rating, :review, :ai_response, :summary, :action, :category, :idempotency_key)
+            ON CONFLICT DO NOTHING
+            """,
+            rows,
+        )
+        return inserted if inserted >= 0 else len(rows)
+
+    def load(self, after_id=None) -> pd.DataFrame:
+        where = "WHERE id > :after_id" if after_id is not None else ""
+        return self._query(
+            f"""
+            SELECT {", ".join(REVIEW_COLUMNS)}
+            FROM public.reviews
+            {where}
+            ORDER BY id DESC;
+            """,
+            {"after_id": after_id},
+        )
+
+    def rating_counts(self) -> dict:
+        if self.use_stats_table:
+            sql = """
+                SELECT rating, review_count AS n
+                FROM public.review_rating_counts
+                WHERE review_count > 0
+                ORDER BY rating;
+            """
+        else:
+            sql = """
+                SELECT rating, COUNT(*) AS n
+                FROM public.reviews
+                GROUP BY rating
+                ORDER BY rating;
+            """
+        df = self._query(sql)
+        return {int(r): int(n) for r, n in zip(df["rating"], df["n"])}
+
+    def data_version(self) -> tuple:
+        # MAX(id) is an index lookup; the count comes from the counter table when enabled
+        if self.use_stats_table:
+            sql = """
+                SELECT (SELECT COALESCE(MAX(id), 0) FROM public.reviews) AS max_id,
+                       (SELECT COALESCE(SUM(review_count), 0) FROM public.review_rating_counts) AS n;
+            """
+        else:
+            sql = "SELECT COALESCE(MAX(id), 0) AS max_id, COUNT(*) AS n FROM public.reviews;"
+        df = self._query(sql)
+        return int(df.iloc[0, 0]), int(df.iloc[0, 1])
+
+    def change_token(self):
+        # A counter bumped by the LISTEN thread, so a probe is a memory read.
+        # Polls data_version while not listening (disabled, not migrated, or
+        # reconnecting).
+        if REVIEW_LISTEN:
+            with self._connection_lock:
+                if self._listener is None:
+                    self._listener = threading.Thread(target=self._listen, name="reviews-listen", daemon=True)
+                    self._listener.start()
+            self._listener_ready.wait(5)
+            if self._listening:
+                return ("notify", self._generation)
+        return self.data_version()
+
+    def _listen(self):
+        import select
+        while True:
+            raw = None
+            try:
+                raw = self._conn().engine.raw_connection()
+                raw.detach()  # a LISTEN session must never go back to the pool
+                dbapi = getattr(raw, "driver_connection", None) or raw.connection
+                dbapi.autocommit = True
+                with dbapi.cursor() as cur:
+                    cur.execute("SELECT 1 FROM pg_trigger WHERE tgname = 'reviews_notify_changed'")
+                    if cur.fetchone() is None:
+                        print("⚠️ REVIEWS NOTIFY TRIGGER MISSING (apply sql/005_reviews_notify.sql); polling instead")
+                        raw.close()
+                        self._listener_ready.set()
+                        return
+                    cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                # Anything may have changed while we were not listening
+                self._generation += 1
+                self._listening = True
+                self._listener_ready.set()
+                while True:
+                    if select.select([dbapi], [], [], 60)[0]:
+                        dbapi.poll()
+                        if dbapi.notifies:
+                            dbapi.notifies.clear()
+                            self._generation += 1
+                    else:
+                        # Idle minute: a round trip surfaces a dead connection
+                        with dbapi.cursor() as cur:
+                            cur.execute("SELECT 1")
+            except Exception as e:
+                print("⚠️ REVIEWS LISTEN ERROR:", e)
+                self._listening = False
+                self._listener_ready.set()
+                if raw is not None:
+                    try:
+                        raw.close()
+                    except Exception:
+                        pass
+                time.sleep(LISTEN_RETRY_SECONDS)
+
+    def page(self, column, before=None, limit=25, category=None, rating=None) -> pd.DataFrame:
+        _check_column(column)
+        where, params = _facet_filters(category, rating, before=before)
+        return self._query(
+            f"""
+            SELECT id, rating, category, created_at, {column}
+            FROM public.reviews
+            {where}
+            ORDER BY created_at DESC, id DESC
+            LIMIT :limit;
+            """,
+            {**params, "limit": int(limit)},
+        )
+
+    def trends(self, bucket="day", days=90, category=None) -> pd.DataFrame:
+        if bucket not in TREND_BUCKETS:
+            raise ValueError(f"Unknown trend bucket: {bucket}")
+        since = datetime.now(timezone.utc) - timedelta(days=int(days))
+        where, params = _facet_filters(category, since=since)
+        return self._query(
+            f"""
+            SELECT date_trunc('{bucket}', created_at) AS bucket,
+                   COALESCE(category, 'uncategorized') AS category,
+                   COUNT(*) AS reviews,
+                   ROUND(AVG(rating)::numeric, 2) AS avg_rating
+            FROM public.reviews
+            {where}
+            GROUP BY 1, 2
+            ORDER BY 1, 2;
+            """,
+            params,
+        )
+
+    def iter_batches(self, after_id=0, batch_size=500):
+        from sqlalchemy import text
+        sql = text("""
+            SELECT id, rating, review
+            FROM public.reviews
+            WHERE id > :after_id
+            ORDER BY id
+            LIMIT :limit
+        """)
+        conn = self._conn()
+        while True:
+            with conn.session as session:
+                batch = [
+                    dict(row._mapping)
+                    for row in session.execute(sql, {"after_id": after_id, "limit": batch_size})
+                ]
+            if not batch:
+                return
+            yield batch
+            after_id = batch[-1]["id"]
+
+    def update_insights(self, rows) -> int:
+        rows = [
+            {"id": r["id"], "category": r.get("category"), "summary": r["summary"], "action": r["action"]}
+            for r in rows
+        ]
+        if not rows:
+            return 0
+        self._execute(
+            """
+            UPDATE public.reviews
+            SET category = COALESCE(:category, category), summary = :summary, recommended_action = :action
+            WHERE id = :id
+            """,
+            rows,
+        )
+        return len(rows)
+
+    def search(self, query, limit=25, offset=0) -> pd.DataFrame:
+        # Uses the generated search_vector column + GIN index from sql/003_reviews_search.sql
+        if not query.strip():
+            import pandas as pd
+            return pd.DataFrame(columns=["id", "rating", "review", "summary", "recommended_action"])
+        return self._query(
+            """
+            SELECT id, rating, review, summary, recommended_action
+            FROM public.reviews, websearch_to_tsquery('english', :query) AS q
+            WHERE search_vector @@ q
+            ORDER BY ts_rank_cd(search_vector, q) DESC, id DESC
+            LIMIT :limit OFFSET :offset;
+            """,
+            {"query": query, "limit": int(limit), "offset": int(offset)},
+        )
+
+    def stream(self, columns=EXPORT_COLUMNS, chunk_size=5000, category=None, rating=None,
+               since=None, until=None):
+        from sqlalchemy import text
+        for column in columns:
+            if column not in REVIEW_COLUMNS:
+                raise ValueError(f"Unknown review column: {column}")
+        where, params = _facet_filters(category, rating, since=since, until=until)
+        # stream_results makes psycopg2 use a named (server-side) cursor, so
+        # rows arrive chunk_size at a time instead of as one client-side buffer
+        sql = text(f"SELECT {', '.join(columns)} FROM public.reviews {where} ORDER BY id")
+        sql = sql.execution_options(stream_results=True)
+        with self._conn().session as session:
+            result = session.execute(sql, params)
+            for partition in result.partitions(chunk_size):
+                yield [tuple(row) for row in partition]
+
+# ==================== SQLITE (LOCAL) ====================
+
+# id is the rowid alias, so it is already the table's clustered key
+SQLITE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS reviews (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        rating INTEGER,
+        review TEXT,
+        ai_response TEXT,
+        summary TEXT,
+        recommended_action TEXT,
+        created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        category TEXT,
+        idempotency_key TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_reviews_rating ON reviews (rating)",
+    "CREATE INDEX IF NOT EXISTS idx_reviews_created_at ON reviews (created_at)",
+    # Secondary indexes carry the rowid (id) implicitly, so these also serve
+    # the (created_at, id) keyset order within a facet
+    "CREATE INDEX IF NOT EXISTS idx_reviews_category_created ON reviews (category, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_reviews_rating_created ON reviews (rating, created_at)",
+    # A resubmitted review (double click, write-behind replay) is inserted once
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_reviews_idempotency_key
+    ON reviews (idempotency_key) WHERE idempotency_key IS NOT NULL
+    """,
+)
+
+# External-content FTS5 index kept in sync by triggers, so every insert made
+# through save_review (or anything else) is searchable immediately
+SQLITE_FTS_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5(
+        review, summary, recommended_action,
+        content='reviews', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reviews_fts_insert AFTER INSERT ON reviews BEGIN
+        INSERT INTO reviews_fts (rowid, review, summary, recommended_action)
+        VALUES (new.id, new.review, new.summary, new.recommended_action);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reviews_fts_delete AFTER DELETE ON reviews BEGIN
+        INSERT INTO reviews_fts (reviews_fts, rowid, review, summary, recommended_action)
+        VALUES ('delete', old.id, old.review, old.summary, old.recommended_action);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reviews_fts_update
+    AFTER UPDATE OF review, summary, recommended_action ON reviews BEGIN
+        INSERT INTO reviews_fts (reviews_fts, rowid, review, summary, recommended_action)
+        VALUES ('delete', old.id, old.review, old.summary, old.recommended_action);
+        INSERT INTO reviews_fts (rowid, review, summary, recommended_action)
+        VALUES (new.id, new.review, new.summary, new.recommended_action);
+    END
+    """,
+)
+
+# Idle connections kept per store; busier moments open extra ones that are
+# closed on return
+SQLITE_POOL_SIZE = int(os.environ.get("REVIEW_DB_POOL_SIZE", "8"))
+
+class SQLiteStore(ReviewStore):
+    # Single-node backend. WAL lets readers run alongside the writer.
+    # Connections are checked out of a small process-wide pool rather than
+    # tied to a thread (Streamlit runs every rerun on a fresh thread), and
+    # sqlite3 keeps compiled statements in a per-connection cache, so the
+    # fixed parameterized SQL below is prepared once per pooled connection.
+
+    name = "sqlite"
+
+    def __init__(self, path="reviews.db", pool_size=SQLITE_POOL_SIZE):
+        self.path = path
+        self.pool_size = pool_size
+        self._pool = []
+        self._pool_lock = threading.Lock()
+        self._probe = None
+        self._probe_lock = threading.Lock()
+        self._migrate()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Only ever used by one thread at a time, but not always the same one
+        conn = sqlite3.connect(self.path, timeout=30, cached_statements=256, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @contextmanager
+    def _conn(self):
+        with self._pool_lock:
+            conn = self._pool.pop() if self._pool else None
+        if conn is None:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()  # never hand out a connection mid-transaction
+            with self._pool_lock:
+                if len(self._pool) < self.pool_size:
+                    self._pool.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def _migrate(self):
+        with self._conn() as conn:
+            self._migrate_schema(conn)
+
+    def _migrate_schema(self, conn):
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(reviews)")]
+        if columns and "id" not in columns:
+            # Older reviews.db files were created without a key; rebuild with one
+            with conn:
+                conn.execute("ALTER TABLE reviews RENAME TO reviews_legacy")
+                conn.execute(SQLITE_SCHEMA[0])
+                conn.execute("""
+                    INSERT INTO reviews (rating, review, ai_response, summary, recommended_action)
+                    SELECT rating, review, ai_response, summary, recommended_action
+                    FROM reviews_legacy ORDER BY rowid
+                """)
+                conn.execute("DROP TABLE reviews_legacy")
+        else:
+            if columns and "created_at" not in columns:
+                # SQLite only allows constant defaults on ADD COLUMN
+                with conn:
+                    conn.execute("ALTER TABLE reviews ADD COLUMN created_at TEXT NOT NULL DEFAULT ''")
+            if columns and "category" not in columns:
+                with conn:
+                    conn.execute("ALTER TABLE reviews ADD COLUMN category TEXT")
+            if columns and "idempotency_key" not in columns:
+                with conn:
+                    conn.execute("ALTER TABLE reviews ADD COLUMN idempotency_key TEXT")
+        with conn:
+            for statement in SQLITE_SCHEMA:
+                conn.execute(statement)
+        self._ensure_fts(conn)
+
+    def _ensure_fts(self, conn):
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reviews_fts'"
+        ).fetchone()
+        try:
+            with conn:
+                for statement in SQLITE_FTS_SCHEMA:
+                    conn.execute(statement)
+                if not exists:
+                    # Index rows that predate the FTS table
+                    conn.execute("INSERT INTO reviews_fts (reviews_fts) VALUES ('rebuild')")
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            # SQLite built without FTS5: search falls back to a LIKE scan
+            print("⚠️ SQLITE FTS5 UNAVAILABLE:", e)
+            self.fts = False
+
+    def _frame(self, sql, params=()) -> pd.DataFrame:
+        import pandas as pd
+        with self._conn() as conn:
+            cur = conn.execute(sql, params)
+            return pd.DataFrame.from_records(cur.fetchall(), columns=[d[0] for d in cur.description])
+
+    def save_many(self, rows) -> int:
+        rows = _normalize_rows(rows)
+        if not rows:
+            return 0
+        with self._conn() as conn, conn:
+            # rowcount sums inserted rows (skipped duplicates and FTS trigger writes excluded)
+            cur = conn.executemany(
+                """
+                INSERT INTO reviews
+                    (rating, review, ai_response, summary, recommended_action, category, idempotency_key)
+                VALUES (:rating, :review, :ai_response, :summary, :action, :category, :idempotency_key)
+                ON CONFLICT DO NOTHING
+                """,
+                rows,
+            )
+        return cur.rowcount
+
+    def load(self, after_id=None) -> pd.DataFrame:
+        columns = ", ".join(REVIEW_COLUMNS)
+        if after_id is None:
+            return self._frame(f"SELECT {columns} FROM reviews ORDER BY id DESC")
+        return self._frame(
+            f"SELECT {columns} FROM reviews WHERE id > ? ORDER BY id DESC", (after_id,)
+        )
+
+    def rating_counts(self) -> dict:
+        with self._conn() as conn:
+            rows = conn.execute(
+                "SELECT rating, COUNT(*) FROM reviews GROUP BY rating ORDER BY rating"
+            ).fetchall()
+        return {int(r): int(n) for r, n in rows}
+
+    def data_version(self) -> tuple:
+        with self._conn() as conn:
+            max_id, n = conn.execute(
+                "SELECT COALESCE(MAX(id), 0), COUNT(*) FROM reviews"
+            ).fetchone()
+        return int(max_id), int(n)
+
+    def change_token(self):
+        # PRAGMA data_version on a connection that never writes changes on
+        # every commit made by any other connection, in this process or
+        # another, without touching a table
+        with self._probe_lock:
+            if self._probe is None:
+                self._probe = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            return self._probe.execute("PRAGMA data_version").fetchone()[0]
+
+    def page(self, column, before=None, limit=25, category=None, rating=None) -> pd.DataFrame:
+        _check_column(column)
+        where, params = _facet_filters(category, rating, before=before)
+        return self._frame(
+            f"""
+            SELECT id, rating, category, created_at, {column}
+            FROM reviews
+            {where}
+            ORDER BY created_at DESC, id DESC
+            LIMIT :limit
+            """,
+            {**params, "limit": int(limit)},
+        )
+
+    def trends(self, bucket="day", days=90, category=None) -> pd.DataFrame:
+        # Weeks start on Monday, matching Postgres date_trunc('week')
+        expressions = {
+            "day": "date(created_at)",
+            "week": "date(created_at, '-6 days', 'weekday 1')",
+        }
+        if bucket not in expressions:
+            raise ValueError(f"Unknown trend bucket: {bucket}")
+        # created_at is CURRENT_TIMESTAMP text (UTC), so compare in that format
+        since = (datetime.now(timezone.utc) - timedelta(days=int(days))).strftime("%Y-%m-%d %H:%M:%S")
+        where, params = _facet_filters(category, since=since)
+        return self._frame(
+            f"""
+            SELECT {expressions[bucket]} AS bucket,
+                   COALESCE(category, 'uncategorized') AS category,
+                   COUNT(*) AS reviews,
+                   ROUND(AVG(rating), 2) AS avg_rating
+            FROM reviews
+            {where}
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+            """,
+            params,
+        )
+
+    def iter_batches(self, after_id=0, batch_size=500):
+        while True:
+            # Checked out per batch so a paused or abandoned scan holds no connection
+            with self._conn() as conn:
+                batch = [
+                    {"id": i, "rating": r, "review": t}
+                    for i, r, t in conn.execute(
+                        "SELECT id, rating, review FROM reviews WHERE id > ? ORDER BY id LIMIT ?",
+                        (after_id, batch_size),
+                    )
+                ]
+            if not batch:
+                return
+            yield batch
+            after_id = batch[-1]["id"]
+
+    def update_insights(self, rows) -> int:
+        rows = [
+            {"id": r["id"], "category": r.get("category"), "summary": r["summary"], "action": r["action"]}
+            for r in rows
+        ]
+        if not rows:
+            return 0
+        with self._conn() as conn, conn:
+            conn.executemany(
+                """
+                UPDATE reviews
+                SET category = COALESCE(:category, category), summary = :summary, recommended_action = :action
+                WHERE id = :id
+                """,
+                rows,
+            )
+        return len(rows)
+
+    def search(self, query, limit=25, offset=0) -> pd.DataFrame:
+        columns = "r.id, r.rating, r.review, r.summary, r.recommended_action"
+        if self.fts:
+            match = fts5_query(query)
+            if not match:
+                import pandas as pd
+                return pd.DataFrame(columns=["id", "rating", "review", "summary", "recommended_action"])
+            # bm25 weights: review > summary > recommended_action
+            return self._frame(
+                f"""
+                SELECT {columns}
+                FROM reviews_fts f JOIN reviews r ON r.id = f.rowid
+                WHERE reviews_fts MATCH ?
+                ORDER BY bm25(reviews_fts, 3.0, 2.0, 1.0), r.id DESC
+                LIMIT ? OFFSET ?
+                """,
+                (match, int(limit), int(offset)),
+            )
+        pattern = f"%{query.strip()}%"
+        return self._frame(
+            f"""
+            SELECT {columns} FROM reviews r
+            WHERE r.review LIKE ? OR r.summary LIKE ? OR r.recommended_action LIKE ?
+            ORDER BY r.id DESC LIMIT ? OFFSET ?
+            """,
+            (pattern, pattern, pattern, int(limit), int(offset)),
+        )
+
+    def stream(self, columns=EXPORT_COLUMNS, chunk_size=5000, category=None, rating=None,
+               since=None, until=None):
+        for column in columns:
+            if column not in REVIEW_COLUMNS:
+                raise ValueError(f"Unknown review column: {column}")
+        where, params = _facet_filters(category, rating, since=since, until=until)
+        # A private connection: the read transaction stays open for the whole
+        # export, and under WAL it never blocks the app's writers
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            cur = conn.execute(f"SELECT {', '.join(columns)} FROM reviews {where} ORDER BY id", params)
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            conn.close()
+
+# ==================== FACTORY ====================
+
+def create_store(backend: str = None) -> ReviewStore:
+    backend = (backend or os.environ.get("REVIEW_STORE", "postgres")).strip().lower()
+    if backend == "sqlite":
+        return SQLiteStore(os.environ.get("REVIEW_DB_PATH", "reviews.db"))
+    if backend in ("postgres", "supabase"):
+        return PostgresStore(use_stats_table=os.environ.get("REVIEW_STATS_TABLE", "0") == "1")
+    raise ValueError(f"Unknown REVIEW_STORE backend: {backend}")
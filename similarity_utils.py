@@ -0,0 +1,241 @@
+# similarity_utils.py
+# Local near-duplicate detection for reviews: character shingles -> MinHash
+# signatures -> LSH banding, all vectorized with NumPy (no GPU, no service).
+import os
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# ==================== CONFIG ====================
+
+SHINGLE_SIZE = int(os.environ.get("DEDUP_SHINGLE_SIZE", "5"))
+NUM_PERM = 64
+LSH_BANDS = 16          # 16 bands x 4 rows: candidate pairs from ~0.5 Jaccard up
+# Loose enough to group rewordings in the explorer's clustered view
+SIMILARITY_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", "0.6"))
+# Copying one review's insights to another needs near-identical text: at 0.6
+# "crashes on login" and "crashes on logout" already match
+REUSE_THRESHOLD = float(os.environ.get("DEDUP_REUSE_THRESHOLD", "0.95"))
+
+# Caps the (shingles,) work arrays at ~8 MB each while hashing a batch
+_CHUNK_SHINGLES = 1_000_000
+
+_rng = np.random.default_rng(0x5EED)  # fixed so signatures are stable across processes
+_PERM_A = _rng.integers(1, 2**63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 2**63, size=NUM_PERM, dtype=np.uint64)
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+def normalize_text(text) -> str:
+    # Case, punctuation and spacing differences should not split a cluster
+    return _NON_WORD.sub(" ", str(text or "").lower()).strip()
+
+# ==================== MINHASH ====================
+
+def _mix(h):
+    # splitmix64 finalizer; the polynomial shingle hash alone is poorly spread
+    h = h ^ (h >> np.uint64(30))
+    h = h * np.uint64(0xBF58476D1CE4E5B9)
+    h = h ^ (h >> np.uint64(27))
+    h = h * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+def _shingle_hashes(texts):
+    # One pass over all texts concatenated: returns (hashes, per-doc counts)
+    n = SHINGLE_SIZE
+    encoded = [normalize_text(t).encode("utf-8").ljust(n) for t in texts]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    buf = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+
+    windows = len(buf) - n + 1
+    hashes = np.zeros(windows, dtype=np.uint64)
+    for k in range(n):
+        hashes = hashes * np.uint64(1099511628211) + buf[k:k + windows]
+
+    # Drop windows that straddle two documents
+    doc_of_byte = np.repeat(np.arange(len(encoded)), lengths)
+    valid = doc_of_byte[:windows] == doc_of_byte[n - 1:]
+    return _mix(hashes[valid]), lengths - n + 1
+
+def minhash_signatures(texts) -> np.ndarray:
+    # (len(texts), NUM_PERM) uint32; rows agree in ~Jaccard(shingles) of positions
+    texts = list(texts)
+    signatures = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+    start = 0
+    while start < len(texts):
+        # Grow the chunk until it holds roughly _CHUNK_SHINGLES shingles
+        end, budget = start, 0
+        while end < len(texts) and (budget < _CHUNK_SHINGLES or end == start):
+            budget += len(texts[end] or "") + 1
+            end += 1
+        hashes, counts = _shingle_hashes(texts[start:end])
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        for p in range(NUM_PERM):
+            permuted = ((hashes * _PERM_A[p] + _PERM_B[p]) >> np.uint64(32)).astype(np.uint32)
+            signatures[start:end, p] = np.minimum.reduceat(permuted, offsets)
+        start = end
+    return signatures
+
+def _band_keys(signatures, band: int) -> np.ndarray:
+    rows = NUM_PERM // LSH_BANDS
+    block = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+    return block.view(np.dtype((np.void, block.dtype.itemsize * rows))).ravel()
+
+# ==================== CLUSTERING ====================
+
+def _components(n: int, src, dst) -> np.ndarray:
+    # Connected components by min-label propagation with pointer jumping
+    labels = np.arange(n)
+    while True:
+        previous = labels
+        low = np.minimum(labels[src], labels[dst])
+        labels = labels.copy()
+        np.minimum.at(labels, src, low)
+        np.minimum.at(labels, dst, low)
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+def cluster_signatures(signatures, threshold: float = SIMILARITY_THRESHOLD) -> np.ndarray:
+    # labels[i] is the index of the first row in i's cluster
+    n = len(signatures)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    index = np.arange(n)
+    src, dst = [], []
+    for band in range(LSH_BANDS):
+        _, first, inverse = np.unique(_band_keys(signatures, band), return_index=True, return_inverse=True)
+        head = first[inverse.ravel()]
+        candidates = np.nonzero(head != index)[0]
+        if not len(candidates):
+            continue
+        # Banding only proposes pairs; keep those whose estimated Jaccard holds up
+        agreement = (signatures[candidates] == signatures[head[candidates]]).mean(axis=1)
+        keep = candidates[agreement >= threshold]
+        src.append(keep)
+        dst.append(head[keep])
+    if not src:
+        return index
+    return _components(n, np.concatenate(src), np.concatenate(dst))
+
+def cluster_texts(texts, threshold: float = SIMILARITY_THRESHOLD) -> np.ndarray:
+    return cluster_signatures(minhash_signatures(texts), threshold)
+
+# ==================== ONLINE LOOKUP ====================
+
+class NearDuplicateIndex:
+    # Bounded LRU of recent texts -> value, looked up by MinHash/LSH so a
+    # reworded duplicate can reuse work done for an earlier review
+    def __init__(self, capacity=5000, threshold=REUSE_THRESHOLD):
+        self.capacity = capacity
+        self.threshold = threshold
+        self._entries = OrderedDict()   # entry id -> (signature, band keys, value)
+        self._bands = [{} for _ in range(LSH_BANDS)]  # band key -> set of entry ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _keys(self, signature):
+        return [_band_keys(signature[None, :], band)[0].tobytes() for band in range(LSH_BANDS)]
+
+    def lookup(self, text):
+        signature = minhash_signatures([text])[0]
+        keys = self._keys(signature)
+        with self._lock:
+            best, best_score = None, self.threshold
+            for band, key in enumerate(keys):
+                for entry_id in self._bands[band].get(key, ()):
+                    other, _, value = self._entries[entry_id]
+                    score = float((other == signature).mean())
+                    if score >= best_score:
+                        best, best_score = entry_id, score
+            if best is None:
+                return None
+            self._entries.move_to_end(best)
+            return self._entries[best][2]
+
+    def add(self, text, value):
+        signature = minhash_signatures([text])[0]
+        keys = self._keys(signature)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (signature, keys, value)
+            for band, key in enumerate(keys):
+                self._bands[band].setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.capacity:
+                old_id, (_, old_keys, _) = self._entries.popitem(last=False)
+                for band, key in enumerate(old_keys):
+                    bucket = self._bands[band].get(key)
+                    if bucket is not None:
+                        bucket.discard(old_id)
+                        if not bucket:
+                            del self._bands[band][key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+# ==================== REVIEW CLUSTERS ====================
+
+class ReviewClusterIndex:
+    # Signatures for every review, extended incrementally by id so a refresh
+    # only hashes rows added since the last one
+    SNIPPET_CHARS = 280
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.max_id = 0
+        self._ids = np.empty(0, dtype=np.int64)
+        self._ratings = np.empty(0, dtype=np.int16)
+        self._signatures = np.empty((0, NUM_PERM), dtype=np.uint32)
+        self._snippets = []
+        self._labels = None
+        self._lock = threading.Lock()
+
+    def extend(self, batch) -> int:
+        # batch: dicts with id, rating, review (oldest first, ids > max_id)
+        batch = [r for r in batch if int(r["id"]) > self.max_id]
+        if not batch:
+            return 0
+        signatures = minhash_signatures([r["review"] for r in batch])
+        with self._lock:
+            self._ids = np.concatenate((self._ids, [int(r["id"]) for r in batch]))
+            self._ratings = np.concatenate((self._ratings, [int(r["rating"] or 0) for r in batch]))
+            self._signatures = np.concatenate((self._signatures, signatures))
+            self._snippets.extend(str(r["review"] or "")[:self.SNIPPET_CHARS] for r in batch)
+            self.max_id = int(self._ids[-1])
+            self._labels = None
+        return len(batch)
+
+    def labels(self) -> np.ndarray:
+        with self._lock:
+            if self._labels is None:
+                self._labels = cluster_signatures(self._signatures, self.threshold)
+            return self._labels
+
+    def clusters(self, min_size=1, limit=None) -> list:
+        # Largest first: dicts with representative id/review, size, avg rating
+        labels = self.labels()
+        with self._lock:
+            ids, ratings, snippets = self._ids, self._ratings, self._snippets
+        if not len(labels):
+            return []
+        heads, inverse, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+        rating_sums = np.bincount(inverse.ravel(), weights=ratings, minlength=len(heads))
+        order = np.lexsort((heads, -sizes))
+        order = order[sizes[order] >= min_size]
+        if limit is not None:
+            order = order[:limit]
+        return [
+            {
+                "id": int(ids[heads[i]]),
+                "review": snippets[heads[i]],
+                "size": int(sizes[i]),
+                "avg_rating": round(float(rating_sums[i] / sizes[i]), 2),
+            }
+            for i in order
+        ]
+
+    def __len__(self):
+        return len(self._ids)
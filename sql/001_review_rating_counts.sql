@@ -0,0 +1,34 @@
+-- Per-rating counters kept in sync by trigger so dashboard metrics are O(1).
+-- Enable in the app with REVIEW_STATS_TABLE=1 after applying this migration.
+
+CREATE TABLE IF NOT EXISTS public.review_rating_counts (
+    rating INTEGER PRIMARY KEY,
+    review_count BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION public.bump_review_rating_counts() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO public.review_rating_counts (rating, review_count)
+        VALUES (NEW.rating, 1)
+        ON CONFLICT (rating) DO UPDATE
+        SET review_count = public.review_rating_counts.review_count + 1;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE public.review_rating_counts
+        SET review_count = review_count - 1
+        WHERE rating = OLD.rating;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reviews_rating_counts ON public.reviews;
+CREATE TRIGGER reviews_rating_counts
+AFTER INSERT OR DELETE OR UPDATE OF rating ON public.reviews
+FOR EACH ROW EXECUTE FUNCTION public.bump_review_rating_counts();
+
+-- Seed from existing rows
+TRUNCATE public.review_rating_counts;
+INSERT INTO public.review_rating_counts (rating, review_count)
+SELECT rating, COUNT(*) FROM public.reviews GROUP BY rating;
@@ -0,0 +1,8 @@
+-- Indexes used by the dashboard aggregates, pagination and time filters.
+-- id is the primary key, so keyset pagination already has its index.
+
+ALTER TABLE public.reviews
+    ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS idx_reviews_rating ON public.reviews (rating);
+CREATE INDEX IF NOT EXISTS idx_reviews_created_at ON public.reviews (created_at);
@@ -0,0 +1,13 @@
+-- Full-text search over review text and AI summaries.
+-- The generated column is recomputed by Postgres on every INSERT/UPDATE, so
+-- rows written by save_review are searchable as soon as they commit.
+
+ALTER TABLE public.reviews
+    ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(review, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(summary, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(recommended_action, '')), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_reviews_search ON public.reviews USING GIN (search_vector);
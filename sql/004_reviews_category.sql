@@ -0,0 +1,10 @@
+-- Persist the AI category and index the faceted explorer and trend queries.
+-- The explorer pages on (created_at, id) DESC within an optional facet, so id
+-- is the last key column to keep every page an index range scan.
+
+ALTER TABLE public.reviews
+    ADD COLUMN IF NOT EXISTS category TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_reviews_created_at_id ON public.reviews (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_reviews_category_created ON public.reviews (category, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_reviews_rating_created ON public.reviews (rating, created_at, id);
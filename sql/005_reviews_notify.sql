@@ -0,0 +1,17 @@
+-- Statement-level NOTIFY so the admin dashboard's live mode can wait for
+-- changes instead of polling (REVIEW_LISTEN=1, the default). LISTEN needs a
+-- direct or session-mode connection; Supabase's transaction pooler drops it.
+-- Postgres folds identical notifications in one transaction, so a bulk
+-- insert or backfill batch produces a single wake-up.
+
+CREATE OR REPLACE FUNCTION public.notify_reviews_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('reviews_changed', TG_OP);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reviews_notify_changed ON public.reviews;
+CREATE TRIGGER reviews_notify_changed
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.reviews
+FOR EACH STATEMENT EXECUTE FUNCTION public.notify_reviews_changed();
@@ -0,0 +1,11 @@
+-- Idempotency key for review submissions. The app derives it from the
+-- session and the submitted content, and inserts with ON CONFLICT DO NOTHING,
+-- so a double-clicked submit or a replayed write-behind batch stores one row.
+-- Rows saved without a key (backfills, imports) stay out of the index.
+
+ALTER TABLE public.reviews
+    ADD COLUMN IF NOT EXISTS idempotency_key TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_reviews_idempotency_key
+    ON public.reviews (idempotency_key)
+    WHERE idempotency_key IS NOT NULL;
@@ -1,9 +1,32 @@
+import hashlib
+import os
+import threading
+import uuid
+from concurrent.futures import TimeoutError as FutureTimeout
 import streamlit as st
-from ai_utils import generate_user_reply, generate_admin_insights
-from data_utils import save_review
+from ai_utils import (
+    AI_PIPELINE, Deadline, QueueFull, fallback_action, fallback_category, fallback_reply,
+    fallback_summary, stream_user_reply, submission_queue, submit_admin_insights, submit_review_bundle,
+    warm_up_http
+)
+from data_utils import WRITE_BEHIND, get_review_writer, save_review, start_warm_up, warm_up_store
+from metrics_utils import metrics, start_metrics_exporter
 
 st.set_page_config(page_title="User Feedback", page_icon="⭐", layout="wide")
 
+start_metrics_exporter()
+start_warm_up(warm_up_store, warm_up_http)
+
+# Longest a user waits for the first sign of a reply, counted from the click
+# (time in line included); insights never count against it
+SUBMIT_BUDGET_SECONDS = float(os.environ.get("SUBMIT_BUDGET_SECONDS", "3"))
+# How often a queued user's place in line is refreshed
+QUEUE_POLL_SECONDS = 0.5
+
+# Start the write-behind flusher early so any journaled reviews are replayed
+if WRITE_BEHIND:
+    get_review_writer()
+
 # -------------------- CUSTOM CSS --------------------
 st.markdown("""
 <style>
@@ -110,6 +133,125 @@ decorative_line = """
 </div>
 """
 
+def response_box_html(reply):
+    return f"""
+    <div class="response-box">
+        <h3>Our Response</h3>
+        <p>{reply}</p>
+    </div>
+    """
+
+# -------------------- BACKGROUND PERSISTENCE --------------------
+def persist_review(insights_future, rating, review, user_reply, key):
+    try:
+        # Works for both (category, summary, action) and the combined 4-tuple
+        category, summary, action = insights_future.result()[-3:]
+        save_review(rating, review, user_reply, summary, action, category, idempotency_key=key)
+    except Exception as e:
+        print("❌ SAVE REVIEW ERROR:", e)
+
+class PendingSave:
+    # Saves the review once both halves are in, whichever arrives last: the
+    # insights (pool thread) and the reply (script thread). Attached as soon
+    # as the insights are submitted, so a rerun or closed tab mid-reply still
+    # persists the review.
+    def __init__(self, rating, review, key):
+        self.rating, self.review, self.key = rating, review, key
+        self._lock = threading.Lock()
+        self._reply = None
+        self._insights_future = None
+
+    def _save_if_ready(self):
+        if self._reply is not None and self._insights_future is not None:
+            persist_review(self._insights_future, self.rating, self.review, self._reply, self.key)
+
+    def set_reply(self, reply):
+        with self._lock:
+            if self._reply is not None:
+                return
+            self._reply = reply
+            ready = self._insights_future is not None
+        if ready:
+            self._save_if_ready()
+
+    def insights_done(self, future):
+        with self._lock:
+            self._insights_future = future
+            ready = self._reply is not None
+        if ready:
+            self._save_if_ready()
+
+# -------------------- ADMISSION --------------------
+def submission_key(rating, review):
+    # Same session + same feedback -> same key, so a double-clicked submit
+    # is answered and stored once
+    session_key = st.session_state.setdefault("session_key", uuid.uuid4().hex)
+    return hashlib.sha256(f"{session_key}\n{rating}\n{review.strip()}".encode("utf-8")).hexdigest()
+
+def wait_in_line(ticket, status_box, deadline) -> bool:
+    # Shows the user's place until a slot frees up; False once the reply
+    # budget has run out in line
+    position = submission_queue.position(ticket)
+    if position:
+        metrics.inc("submissions_queued_total")
+    while position:
+        status_box.info(f"⏳ Lots of feedback coming in right now, you're #{position} in line...")
+        if submission_queue.wait(ticket, timeout=min(QUEUE_POLL_SECONDS, deadline.remaining())):
+            break
+        if deadline.expired():
+            return False
+        position = submission_queue.position(ticket)
+    status_box.empty()
+    return True
+
+def answer_locally(rating, review, key, reply_box, status_box):
+    # Overflow: canned reply now, stored with local insights so nothing is lost
+    metrics.inc("submissions_overflow_total")
+    user_reply = fallback_reply(review)
+    reply_box.markdown(response_box_html(user_reply), unsafe_allow_html=True)
+    save_review(
+        rating, review, user_reply, fallback_summary(review), fallback_action(),
+        fallback_category(review, rating), idempotency_key=key,
+    )
+    status_box.warning("⏳ We're very busy right now, but your feedback has been saved. Thank you!")
+    return user_reply
+
+def answer_with_llm(rating, review, key, reply_box, status_box, deadline):
+    pending = PendingSave(rating, review, key)
+    user_reply, completed = "", False
+
+    # 2️⃣ ADMIN PROCESSING (BACKGROUND) - persisted once insights arrive
+    if AI_PIPELINE == "combined":
+        # One structured call returns reply + insights together
+        insights_future = submit_review_bundle(review, rating)
+    else:
+        # Insights run in the background while the reply streams
+        insights_future = submit_admin_insights(review, rating)
+    insights_future.add_done_callback(pending.insights_done)
+
+    try:
+        if AI_PIPELINE == "combined":
+            with st.spinner("Responding..."):
+                try:
+                    user_reply = insights_future.result(timeout=deadline.remaining())[0]
+                except FutureTimeout:
+                    # Out of budget: answer now, insights are saved when they arrive
+                    user_reply = fallback_reply(review)
+            reply_box.markdown(response_box_html(user_reply), unsafe_allow_html=True)
+        else:
+            # 1️⃣ FAST USER RESPONSE (streamed token by token)
+            with st.spinner("Responding..."):
+                for delta in stream_user_reply(review, rating, deadline=deadline):
+                    user_reply += delta
+                    reply_box.markdown(response_box_html(user_reply), unsafe_allow_html=True)
+        completed = True
+    finally:
+        # A reply cut off by a rerun or closed tab is stored as the canned one
+        pending.set_reply(user_reply.strip() if completed else fallback_reply(review))
+
+    status_box.success("✅ Thank you for your valuable feedback!")
+    return user_reply
+
 # -------------------- HEADER --------------------
 st.markdown(decorative_line, unsafe_allow_html=True)
 
@@ -160,30 +302,32 @@ with col2:
         if review.strip() == "":
             st.warning("⚠️ Please write a review before submitting.")
         else:
-            # 1️⃣ FAST USER RESPONSE
-            with st.spinner("Responding..."):
-                user_reply = generate_user_reply(review, rating)
-
-            st.success("✅ Thank you for your valuable feedback!")
-
-            st.markdown(f"""
-            <div class="response-box">
-                <h3>Our Response</h3>
-                <p>{user_reply}</p>
-            </div>
-            """, unsafe_allow_html=True)
-
-            # 2️⃣ ADMIN PROCESSING (SECONDARY)
-            with st.spinner("Finalizing feedback..."):
-                category,summary, action = generate_admin_insights(review, rating)
-
+            status_box = st.empty()
+            reply_box = st.empty()
+            deadline = Deadline(SUBMIT_BUDGET_SECONDS)
+            key = submission_key(rating, review)
+            answered = st.session_state.setdefault("answered", {})
 
-                save_review(
-                    rating,
-                    review,
-                    user_reply,
-                    summary,
-                    action
-                )
+            if key in answered:
+                # Submitted again from this session: same reply, no new calls or rows
+                reply_box.markdown(response_box_html(answered[key]), unsafe_allow_html=True)
+                status_box.success("✅ We already have this feedback. Thank you!")
+            else:
+                try:
+                    ticket = submission_queue.join()
+                except QueueFull:
+                    ticket = None
+                if ticket is None:
+                    answered[key] = answer_locally(rating, review, key, reply_box, status_box)
+                else:
+                    # The slot covers the user-facing reply; background insights
+                    # are still paced by the Groq quota limiter
+                    try:
+                        if wait_in_line(ticket, status_box, deadline):
+                            answered[key] = answer_with_llm(rating, review, key, reply_box, status_box, deadline)
+                        else:
+                            answered[key] = answer_locally(rating, review, key, reply_box, status_box)
+                    finally:
+                        submission_queue.leave(ticket)
 
 st.markdown(decorative_line, unsafe_allow_html=True)